@@ -6,39 +6,37 @@ from utilities.anonymize import (
     get_cities_list,
     get_abbreviation_dict_correction,
     reformat_to_report,
-    anonymize_analyzer,
+    anonymize_analyzer_reports,
     anonymize_engine,
     add_space_to_comma_endpoint,
     get_list_not_deidentify,
     config_deidentify,
 )
-from utilities.translate import get_translation_dict_correction, translate_report
+from utilities.translate import (
+    TRANSLATION_BACKENDS,
+    get_translation_dict_correction,
+    translate_reports,
+)
 from utilities.convert import (
     convert_df_no_header,
-    convert_df,
-    convert_json,
-    convert_list_phenogenius,
+    convert_phenotypes,
+    convert_phenotypes_json,
+    convert_phenotypes_list_phenogenius,
     convert_pdf_to_text,
 )
+from utilities.document import PipelineDocument
+from utilities.sentence_splitter import (
+    SENTENCE_SPLITTER_STAGES,
+    RuleSentenceSplitter,
+)
 from utilities.extract_hpo import add_biometrics, extract_hpo
 from utilities.get_model import get_models, get_nlp_marian
 import gc
 
 
-def main():
+def main(MarianText_report, analyzer_result):
 
     print("Code Starting")
-    MarianText, _, _ = translate_report(
-        Report,
-        Last_name,
-        First_name,
-        nlp_fr,
-        marian_fr_en,
-        dict_correction,
-        dict_abbreviation_correction,
-    )
-    MarianText_report = reformat_to_report(MarianText, nlp_fr)
-    del MarianText
 
     print("Translation and De-identification")
     (
@@ -46,18 +44,19 @@ def main():
         analyzer_results_return,
         _,
         _,
-    ) = anonymize_analyzer(
-        MarianText_report, analyzer, proper_noun, Last_name, First_name
-    )
+    ) = analyzer_result
 
     print(MarianText_anonymize_report_analyze)
 
     MarianText_anonymize_report_engine = anonymize_engine(
-        MarianText_report, analyzer_results_return, engine, nlp_fr
+        MarianText_report,
+        analyzer_results_return,
+        engine,
+        sentence_splitters["report"],
     )
 
     MarianText_anonymize_report_engine_modif = pd.DataFrame(
-        [x for x in MarianText_anonymize_report_engine.split("\n")]
+        [x for x in MarianText_anonymize_report_engine.text.split("\n")]
     )
 
     MarianText_anonymize_report_engine_df = MarianText_anonymize_report_engine_modif
@@ -87,44 +86,20 @@ def main():
     print("Summarization")
 
     MarianText_anonymized_reformat_space = add_space_to_comma_endpoint(
-        MarianText_anonymize_report_engine, nlp_fr
+        MarianText_anonymize_report_engine, sentence_splitters["spacing"]
     )
     MarianText_anonymized_reformat_biometrics, _ = add_biometrics(
-        MarianText_anonymized_reformat_space, nlp_fr
+        MarianText_anonymized_reformat_space, sentence_splitters["biometrics"]
+    )
+    clinphen = extract_hpo(MarianText_anonymized_reformat_biometrics.text)
+    print(
+        "Sentence segmentations: "
+        + str(MarianText_anonymized_reformat_biometrics.segmentations)
     )
-    clinphen, clinphen_unsafe = extract_hpo(MarianText_anonymized_reformat_biometrics)
 
     del MarianText_anonymize_report_engine
     del MarianText_anonymized_reformat_space
     del MarianText_anonymized_reformat_biometrics
-
-    clinphen_unsafe_check_raw = clinphen_unsafe
-    clinphen_unsafe_check_raw["To keep in list"] = False
-    clinphen_unsafe_check_raw["Confidence on extraction"] = "low"
-
-    del clinphen_unsafe
-
-    clinphen["Confidence on extraction"] = "high"
-    clinphen["To keep in list"] = True
-
-    cols = [
-        "HPO ID",
-        "Phenotype name",
-        "To keep in list",
-        "No. occurrences",
-        "Earliness (lower = earlier)",
-        "Confidence on extraction",
-        "Example sentence",
-    ]
-    clinphen_all = pd.concat([clinphen, clinphen_unsafe_check_raw]).reset_index()
-    clinphen_all = clinphen_all[cols]
-
-    clinphen_df = clinphen_all
-    clinphen_df_without_low_confidence = clinphen_df[
-        clinphen_df["To keep in list"] == True
-    ]
-    del clinphen
-    del clinphen_unsafe_check_raw
     gc.collect()
 
     with open(
@@ -137,7 +112,7 @@ def main():
         + "_summarized_report.tsv",
         "w",
     ) as file:
-        file.write(convert_df(clinphen_df).decode("utf-8"))
+        file.write(convert_phenotypes(clinphen).decode("utf-8"))
     print(
         "Tsv file created successfully : "
         + os.path.join(args.result_dir, "TSV", "")
@@ -159,7 +134,7 @@ def main():
         + "_summarized_report.json",
         "w",
     ) as file:
-        file.write(convert_json(clinphen_df_without_low_confidence))
+        file.write(convert_phenotypes_json(clinphen))
     print(
         "JSON file created successfully : "
         + os.path.join(args.result_dir, "JSON", "")
@@ -181,7 +156,7 @@ def main():
         + "_summarized_report.txt",
         "w",
     ) as file:
-        file.write(convert_list_phenogenius(clinphen_df_without_low_confidence))
+        file.write(convert_phenotypes_list_phenogenius(clinphen))
     print(
         "Text file created successfully : "
         + os.path.join(args.result_dir, "TXT", "")
@@ -224,6 +199,61 @@ if __name__ == "__main__":
         type=str,
         help="The directory where the results will be placed.",
     )
+    parser.add_argument(
+        "--backend",
+        choices=TRANSLATION_BACKENDS,
+        default="pytorch",
+        type=str,
+        help="The translation backend : pytorch, or ctranslate2 for an int8 model converted in the model directory.",
+    )
+    parser.add_argument(
+        "--quantize",
+        action="store_true",
+        help="Use a dynamically int8 quantized model with the pytorch backend, saved in the model directory.",
+    )
+    parser.add_argument(
+        "--num_threads",
+        default=None,
+        type=int,
+        help="Number of threads used by the translation model.",
+    )
+    parser.add_argument(
+        "--num_interop_threads",
+        default=None,
+        type=int,
+        help="Number of interop threads used by the pytorch backend.",
+    )
+    parser.add_argument(
+        "--rule_splitter_stages",
+        nargs="*",
+        choices=SENTENCE_SPLITTER_STAGES,
+        default=[],
+        help="English stages split into sentences with the rule-based splitter instead of stanza : report, spacing, biometrics.",
+    )
+    parser.add_argument(
+        "--batch_size",
+        default=16,
+        type=int,
+        help="Number of reports translated together.",
+    )
+    parser.add_argument(
+        "--deidentify_batch_size",
+        default=32,
+        type=int,
+        help="Number of reports passed together through the spaCy model for de-identification.",
+    )
+    parser.add_argument(
+        "--n_process",
+        default=1,
+        type=int,
+        help="Number of processes running the spaCy model for de-identification.",
+    )
+    parser.add_argument(
+        "--translation_memory",
+        default=None,
+        type=str,
+        help="SQLite file caching sentence translations across runs. Disabled by default, as it stores the reports before de-identification.",
+    )
 
     args = parser.parse_args()
 
@@ -252,7 +282,20 @@ if __name__ == "__main__":
     proper_noun = get_list_not_deidentify()
     cities_list = get_cities_list()
     analyzer, engine = config_deidentify(cities_list)
-    nlp_fr, marian_fr_en = get_nlp_marian(args.language)
+    nlp_fr, marian_fr_en = get_nlp_marian(
+        args.language,
+        args.model_dir,
+        args.backend,
+        args.quantize,
+        args.num_threads,
+        args.num_interop_threads,
+        memory=args.translation_memory,
+    )
+    rule_splitter = RuleSentenceSplitter()
+    sentence_splitters = {
+        stage: rule_splitter if stage in args.rule_splitter_stages else nlp_fr
+        for stage in SENTENCE_SPLITTER_STAGES
+    }
 
     file_name = args.file
     Report_id: str
@@ -261,13 +304,11 @@ if __name__ == "__main__":
     Report: str
 
     if os.path.isfile(args.file):
+        records = []
         with open(file_name, "r") as file:
             for ligne in file:
                 elements = ligne.strip().split("\t")
                 Report_id, Last_name, First_name, text_or_link = elements
-                print("Report_id:", Report_id)
-                print("Last_name:", Last_name)
-                print("First_name:", First_name)
                 if os.path.exists(text_or_link):
                     if text_or_link.lower().endswith(".pdf"):
                         print(f"Processing PDF file: {text_or_link}")
@@ -276,10 +317,60 @@ if __name__ == "__main__":
                         print(
                             f"Unsupported file type. Please provide a link to a PDF files."
                         )
+                        continue
                 else:
                     Report = text_or_link
-                    print("Report:", Report)
-                main()
+                records.append((Report_id, Last_name, First_name, Report))
+
+        # Reports are translated together so that short sentences from
+        # several letters share the same model batches.
+        for i in range(0, len(records), args.batch_size):
+            chunk = records[i : i + args.batch_size]
+            translations = translate_reports(
+                [record[3] for record in chunk],
+                [record[1] for record in chunk],
+                [record[2] for record in chunk],
+                nlp_fr,
+                marian_fr_en,
+                dict_correction,
+                dict_abbreviation_correction,
+                sentence_splitters["spacing"],
+            )
+            MarianText_reports = [
+                reformat_to_report(
+                    PipelineDocument(translation[0]), sentence_splitters["report"]
+                )
+                for translation in translations
+            ]
+            del translations
+            analyzer_results = anonymize_analyzer_reports(
+                [MarianText_report.text for MarianText_report in MarianText_reports],
+                analyzer,
+                proper_noun,
+                [record[1] for record in chunk],
+                [record[2] for record in chunk],
+                args.deidentify_batch_size,
+                args.n_process,
+            )
+            for (
+                (Report_id, Last_name, First_name, Report),
+                MarianText_report,
+                analyzer_result,
+            ) in zip(chunk, MarianText_reports, analyzer_results):
+                print("Report_id:", Report_id)
+                print("Last_name:", Last_name)
+                print("First_name:", First_name)
+                print("Report:", Report)
+                main(MarianText_report, analyzer_result)
                 print()
+        memory = marian_fr_en.memory
+        if memory is not None:
+            print(
+                "Translation memory: "
+                + str(memory.hits)
+                + " hits, "
+                + str(memory.misses)
+                + " misses"
+            )
     else:
         print("Input is not a file. Please provide a valid input.")
@@ -6,19 +6,25 @@ from utilities.anonymize import (
     reformat_to_report,
     anonymize_analyzer,
     anonymize_engine,
-    add_space_to_comma_endpoint,
     get_list_not_deidentify,
     config_deidentify,
 )
-from utilities.translate import get_translation_dict_correction, translate_report
+from utilities.translate import (
+    TRANSLATION_BACKENDS,
+    correct_translated_report,
+    get_translation_dict_correction,
+    translate_report,
+    translate_report_stream,
+)
 from utilities.convert import (
     convert_df_no_header,
     convert_df,
     convert_json,
     convert_list_phenogenius,
     convert_pdf_to_text,
+    convert_phenotypes_df,
 )
-from utilities.extract_hpo import add_biometrics, extract_hpo
+from utilities.extract_hpo import IncrementalHpoExtractor
 from utilities.get_model import get_nlp_marian  # get_models
 import streamlit as st
 import gc
@@ -50,18 +56,26 @@ if "marian_fr_en" not in st.session_state:
 if "load_report" not in st.session_state:
     st.session_state.load_report = False
 
+if "translation" not in st.session_state:
+    st.session_state.translation = (None, None)
+
 if st.session_state.load_models is False:
     with st.form("language"):
         source_lang = st.selectbox(
             "Which is the language of the letter :fr: :es: :de: ?",
             ("fr", "es", "de"),  # "it"
         )
+        backend = st.selectbox(
+            "Which translation backend ?",
+            TRANSLATION_BACKENDS,
+            help="ctranslate2 runs an int8 conversion of the translation model, faster on CPU.",
+        )
         submit_button_L = st.form_submit_button(label="Submit language")
 
     if submit_button_L:
         with st.spinner("Downloading models, it takes a moment, please wait"):
             # models_status = get_models(source_lang)
-            nlp_fr, marian_fr_en = get_nlp_marian(source_lang)
+            nlp_fr, marian_fr_en = get_nlp_marian(source_lang, backend=backend)
             st.session_state.select_lang = source_lang
             st.session_state.nlp_fr = nlp_fr
             st.session_state.marian_fr_en = marian_fr_en
@@ -92,15 +106,43 @@ if st.session_state.load_models is True:
 
     if submit_button or st.session_state.load_report:
         st.session_state.load_report = True
-        MarianText, list_replaced, list_replaced_abb_name = translate_report(
-            courrier,
-            nom,
-            prenom,
-            st.session_state.nlp_fr,
-            st.session_state.marian_fr_en,
-            dict_correction,
-            dict_abbreviation_correction,
-        )
+        if submit_button:
+            # Render the translation progressively on submission, then correct
+            # the streamed text; reruns reuse it without translating again.
+            translation_placeholder = st.empty()
+            translated_sentences = []
+            for sentence in translate_report_stream(
+                courrier,
+                nom,
+                prenom,
+                st.session_state.nlp_fr,
+                st.session_state.marian_fr_en,
+                dict_abbreviation_correction,
+            ):
+                translated_sentences.append(sentence)
+                translation_placeholder.text("\n".join(translated_sentences))
+            translation_placeholder.empty()
+            MarianText, list_replaced = correct_translated_report(
+                "\n".join(translated_sentences),
+                nom,
+                prenom,
+                dict_correction,
+                st.session_state.nlp_fr,
+            )
+            del translated_sentences
+            st.session_state.translation = ((courrier, nom, prenom), MarianText)
+        elif st.session_state.translation[0] == (courrier, nom, prenom):
+            MarianText = st.session_state.translation[1]
+        else:
+            MarianText, list_replaced, list_replaced_abb_name = translate_report(
+                courrier,
+                nom,
+                prenom,
+                st.session_state.nlp_fr,
+                st.session_state.marian_fr_en,
+                dict_correction,
+                dict_abbreviation_correction,
+            )
         MarianText_letter = reformat_to_report(MarianText, st.session_state.nlp_fr)
         del MarianText
 
@@ -144,44 +186,27 @@ if st.session_state.load_models is True:
 
         st.subheader("Summarization")
 
-        MarianText_anonymized_reformat_space = add_space_to_comma_endpoint(
-            MarianText_anonymize_letter_engine, st.session_state.nlp_fr
-        )
-        MarianText_anonymized_reformat_biometrics, additional_terms = add_biometrics(
-            MarianText_anonymized_reformat_space, st.session_state.nlp_fr
-        )
-        clinphen, clinphen_unsafe = extract_hpo(
-            MarianText_anonymized_reformat_biometrics
+        # Summarize the curated letter; only edited sentences are reanalyzed.
+        if (
+            "hpo_extractor" not in st.session_state
+            or st.session_state.hpo_extractor.nlp is not st.session_state.nlp_fr
+        ):
+            st.session_state.hpo_extractor = IncrementalHpoExtractor(
+                st.session_state.nlp_fr
+            )
+        letter_lines = [
+            line
+            for line in MarianText_anonymize_letter_engine_df.iloc[:, 0].tolist()
+            if isinstance(line, str)
+        ]
+        clinphen, additional_terms = st.session_state.hpo_extractor.extract(
+            letter_lines
         )
 
         del MarianText_anonymize_letter_engine
-        del MarianText_anonymized_reformat_space
-        del MarianText_anonymized_reformat_biometrics
-
-        clinphen_unsafe_check_raw = clinphen_unsafe
-        # clinphen_unsafe_check_raw["name"] = nom
-        # clinphen_unsafe_check_raw["surname"] = prenom
-        clinphen_unsafe_check_raw["To keep in list"] = False
-        clinphen_unsafe_check_raw["Confidence on extraction"] = "low"
-
-        del clinphen_unsafe
-
-        # clinphen["name"] = nom
-        # clinphen["surname"] = prenom
-        clinphen["Confidence on extraction"] = "high"
-        clinphen["To keep in list"] = True
-
-        cols = [
-            "HPO ID",
-            "Phenotype name",
-            "To keep in list",
-            "No. occurrences",
-            "Earliness (lower = earlier)",
-            "Confidence on extraction",
-            "Example sentence",
-        ]
-        clinphen_all = pd.concat([clinphen, clinphen_unsafe_check_raw]).reset_index()
-        clinphen_all = clinphen_all[cols]
+        del letter_lines
+
+        clinphen_all = convert_phenotypes_df(clinphen)
         clinphen_df = st.data_editor(
             clinphen_all, num_rows="dynamic", key="data_editor"
         )
@@ -189,7 +214,6 @@ if st.session_state.load_models is True:
             clinphen_df["To keep in list"] == True
         ]
         del clinphen
-        del clinphen_unsafe_check_raw
         gc.collect()
 
         st.caption(
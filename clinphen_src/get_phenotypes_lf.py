@@ -1,17 +1,23 @@
-from collections import defaultdict
+from collections import OrderedDict, defaultdict
+from functools import lru_cache
+from typing import List, NamedTuple, Optional
 from nltk.stem import WordNetLemmatizer
-import pandas as pd
 import re
+from .hpo_artifact import HPO_NAMES_FILE, HPO_SYN_MAP_FILE, load_hpo_artifact
+from .phrase_matcher import PhraseAutomaton, tokenize
 
-HPO_SYN_MAP_FILE = "clinphen_src/data/hpo_synonym_filter.txt"
+# "bag": a synonym matches a subsentence containing all of its tokens, in any
+# order. "phrase": approximate contiguous matching; the synonym files only
+# keep reordered tokens, so a phrase is either a stored synonym or a term name
+# (see load_hpo_phrase_automaton), and its hits are a subset of the bag hits.
+MATCH_MODES = ["bag", "phrase"]
 
+HPO_LEMMA_TABLE_FILE = "clinphen_src/data/hpo_lemma_table.tsv"
+LEMMA_CACHE_SIZE = 65536
 
-def getNames():
-    returnMap = {}
-    for line in open("clinphen_src/data/hpo_term_names.txt"):
-        lineData = line.strip().split("\t")
-        returnMap[lineData[0]] = lineData[1]
-    return returnMap
+
+def getNames(names_file=HPO_NAMES_FILE):
+    return load_hpo_artifact(names_file=names_file).names
 
 
 point_enders = [".", "•", "•", ";", "\t"]
@@ -44,80 +50,68 @@ def end_of_subpoint(word):
     return False
 
 
-def string_to_record_linewise(medical_record):
-    return medical_record.split("\n")
+def split_subsentences(words):
+    subsents = []
+    curSubsent = []
+    for word in words:
+        curSubsent.append(word)
+        if end_of_subpoint(word):
+            subsents.append(" ".join(curSubsent))
+            curSubsent = []
+    if len(curSubsent) > 0:
+        subsents.append(" ".join(curSubsent))
+    return subsents
 
 
-def load_medical_record_linewise(medical_record):
-    recordFile = string_to_record_linewise(medical_record)
-    sentences = []
-    for line in recordFile:
+class SegmentedRecord(NamedTuple):
+    # Sentences as tuples of subsentences, those of the record read as running
+    # text then those of the re-read of each line containing ":". Identical
+    # sentences are the same interned tuple.
+    sentences: List[tuple]
+
+
+def segment_medical_record(medical_record):
+    # Single pass over the lines producing both views of the record.
+    record_sentences = []
+    line_sentences = []
+    curSentence = []
+    for line in medical_record.split("\n"):
+        line = line.lower()
+        for word in line.split(" "):
+            if len(word) < 1:
+                continue
+            curSentence.append(word)
+            if end_of_point(word):
+                record_sentences.append(curSentence)
+                curSentence = []
         if ":" not in line:
             continue
-        curSentence = []
+        curLineSentence = []
         for word in line.strip().split(" "):
-            word = word.lower()
             if len(word) < 1:
                 continue
-            curSentence.append(word)
+            curLineSentence.append(word)
             if end_of_point(word):
-                sentences.append(" ".join(curSentence))
-                curSentence = []
-        if len(curSentence) > 0:
-            sentences.append(" ".join(curSentence))
-    subsentence_sets = []
-    for sent in sentences:
-        subsents = []
-        curSubsent = []
-        for word in sent.split(" "):
-            word = word.lower()
-            curSubsent.append(word)
-            if end_of_subpoint(word):
-                subsents.append(" ".join(curSubsent))
-                curSubsent = []
-        if len(curSubsent) > 0:
-            subsents.append(" ".join(curSubsent))
-        subsentence_sets.append(subsents)
-    return subsentence_sets
-
+                line_sentences.append(curLineSentence)
+                curLineSentence = []
+        if len(curLineSentence) > 0:
+            line_sentences.append(curLineSentence)
+    if len(curSentence) > 0:
+        record_sentences.append(curSentence)
 
-def string_to_record_nonlinewise(medical_record):
-    listForm = []
-    for line in medical_record.split("\n"):
-        if len(line) < 1:
-            continue
-        listForm.append(line)
-    return " ".join(listForm).split(" ")
+    interned = {}
+    sentences = []
+    for words in record_sentences + line_sentences:
+        sentence = tuple(split_subsentences(words))
+        sentence = interned.setdefault(sentence, sentence)
+        sentences.append(sentence)
+    return SegmentedRecord(sentences)
 
 
 def load_medical_record_subsentences(medical_record):
-    record = string_to_record_nonlinewise(medical_record)
-    sentences = []
-    curSentence = []
-    for word in record:
-        word = word.lower()
-        if len(word) < 1:
-            continue
-        curSentence.append(word)
-        if end_of_point(word):
-            sentences.append(" ".join(curSentence))
-            curSentence = []
-    if len(curSentence) > 0:
-        sentences.append(" ".join(curSentence))
-    subsentence_sets = []
-    for sent in sentences:
-        subsents = []
-        curSubsent = []
-        for word in sent.split(" "):
-            word = word.lower()
-            curSubsent.append(word)
-            if end_of_subpoint(word):
-                subsents.append(" ".join(curSubsent))
-                curSubsent = []
-        if len(curSubsent) > 0:
-            subsents.append(" ".join(curSubsent))
-        subsentence_sets.append(subsents)
-    return subsentence_sets + load_medical_record_linewise(medical_record)
+    return [
+        list(sentence) for sentence in segment_medical_record(medical_record).sentences
+    ]
 
 
 # Checks the given sentence for any flags from the lists you indicate.
@@ -187,6 +181,16 @@ treatment_flags = []
 history_flags = []
 mild_flags = []
 uncertain_flags = []
+flag_categories = {
+    "negative": negative_flags,
+    "family": family_flags,
+    "healthy": healthy_flags,
+    "disease": disease_flags,
+    "treatment": treatment_flags,
+    "history": history_flags,
+    "uncertain": uncertain_flags,
+    "mild": mild_flags,
+}
 
 
 low_synonyms = set(
@@ -279,31 +283,81 @@ def custom_lemmas(word):
     return returnSet
 
 
+_lemmatizer = WordNetLemmatizer()
+
+
+@lru_cache(maxsize=LEMMA_CACHE_SIZE)
 def lemmatize(word):
     word = re.sub("[^0-9a-zA-Z]+", "", word)
     word = word.lower()
-    return WordNetLemmatizer().lemmatize(word)
+    return _lemmatizer.lemmatize(word)
+
+
+def compute_word_lemmas(word):
+    lemmas = set()
+    lemma = lemmatize(word)
+    if len(lemma) > 0:
+        lemmas.add(lemma)
+    lemmas |= synonym_lemmas(word)
+    lemmas |= custom_lemmas(word)
+    return frozenset(lemmas)
+
+
+@lru_cache(maxsize=None)
+def load_lemma_table(filename=HPO_LEMMA_TABLE_FILE):
+    # Precomputed word -> lemmas table for the HPO synonym vocabulary and the
+    # flag lists (see write_lemma_table). Missing table means every word goes
+    # through WordNet once and is then served from the LRU cache.
+    returnMap = {}
+    try:
+        for line in open(filename):
+            lineData = line.rstrip("\n").split("\t")
+            returnMap[lineData[0]] = frozenset(lineData[1:])
+    except FileNotFoundError:
+        pass
+    return returnMap
+
+
+@lru_cache(maxsize=LEMMA_CACHE_SIZE)
+def word_lemmas(word):
+    lemmas = load_lemma_table().get(word)
+    if lemmas is None:
+        lemmas = compute_word_lemmas(word)
+    return lemmas
 
 
 def add_lemmas(wordSet):
     lemmas = set()
     for word in wordSet:
-        lemma = lemmatize(word)
-        if len(lemma) > 0:
-            lemmas.add(lemma)
-        lemmas |= synonym_lemmas(word)
-        lemmas |= custom_lemmas(word)
+        lemmas |= word_lemmas(word)
     return wordSet | lemmas
 
 
-def get_flags(line, *flagsets):
-    line = add_lemmas(set(line))
-    returnFlags = set()
-    for flagset in flagsets:
-        flagset = add_lemmas(set(flagset))
-        for word in flagset:
-            if word in line:
-                returnFlags.add(word)
+@lru_cache(maxsize=None)
+def load_flag_vocabulary():
+    # Lemma-expanded flag words -> categories, computed once per process since
+    # the flag lists are constants.
+    returnMap = defaultdict(list)
+    for category, flagset in flag_categories.items():
+        for word in add_lemmas(set(flagset)):
+            returnMap[word].append(category)
+    return {word: tuple(categories) for word, categories in returnMap.items()}
+
+
+def get_flags(line, *categories):
+    # Returns {flag word: category} for the flags of the given categories (all
+    # of them by default) found in the line, in alphabetical order so that the
+    # flag reported for a low confidence phenotype does not depend on the hash
+    # seed.
+    if len(categories) < 1:
+        categories = tuple(flag_categories.keys())
+    flag_vocabulary = load_flag_vocabulary()
+    returnFlags = {}
+    for word in sorted(add_lemmas(set(line))):
+        for category in flag_vocabulary.get(word, ()):
+            if category in categories:
+                returnFlags[word] = category
+                break
     return returnFlags
 
 
@@ -316,24 +370,181 @@ def alphanum_only(wordSet):
 
 
 def load_mr_map(parsed_record):
-    returnMap = defaultdict(set)
+    # word -> bitset of the lines containing it (bit i set for line i)
+    returnMap = defaultdict(int)
     for i in range(len(parsed_record)):
-        line = set(parsed_record[i])
-        for word in line:
-            returnMap[word].add(i)
+        bit = 1 << i
+        for word in parsed_record[i]:
+            returnMap[word] |= bit
     return returnMap
 
 
+def bitset_to_lines(bits):
+    lines = []
+    while bits:
+        low_bit = bits & -bits
+        lines.append(low_bit.bit_length() - 1)
+        bits ^= low_bit
+    return lines
+
+
 def load_all_hpo_synonyms(filename=HPO_SYN_MAP_FILE):
     returnMap = defaultdict(set)
-    for line in open(filename):
-        lineData = line.strip().split("\t")
-        hpo = lineData[0]
-        syn = lineData[1]
+    for hpo, syn in load_hpo_artifact(syn_file=filename).iter_synonyms():
         returnMap[hpo].add(syn)
     return returnMap
 
 
+def synonym_tokens(syn):
+    syn = re.sub("[^0-9a-zA-Z]+", " ", syn.lower())
+    return frozenset(alphanum_only(set([syn])))
+
+
+@lru_cache(maxsize=None)
+def load_hpo_synonym_index(filename=HPO_SYN_MAP_FILE):
+    # Inverted index token -> [(hpoID, synonym tokens)]. Each synonym is
+    # tokenized once and filed under its rarest token only, so a record visits
+    # just the synonyms whose rarest token it actually contains. Built in each
+    # process from the mapped artifact.
+    tokenized = set()
+    for hpoID, syn in load_hpo_artifact(syn_file=filename).iter_synonyms():
+        synTokens = synonym_tokens(syn)
+        if len(synTokens) < 1:
+            continue
+        tokenized.add((hpoID, synTokens))
+    token_counts = defaultdict(int)
+    for hpoID, synTokens in tokenized:
+        for token in synTokens:
+            token_counts[token] += 1
+    index = defaultdict(list)
+    for hpoID, synTokens in sorted(tokenized, key=lambda x: (x[0], sorted(x[1]))):
+        rarest = min(synTokens, key=lambda token: (token_counts[token], token))
+        index[rarest].append((hpoID, synTokens))
+    return dict(index)
+
+
+def phrase_tokens(text):
+    return tokenize(text, normalize=lemmatize)
+
+
+@lru_cache(maxsize=None)
+def load_hpo_phrase_automaton(filename=HPO_SYN_MAP_FILE):
+    # Synonyms in the synonym files are stored with their tokens reordered and
+    # the original word order is not shipped, so this is an approximation:
+    # only the stored order and the term name of each HPO ID are matched.
+    artifact = load_hpo_artifact(syn_file=filename)
+    syns = list(artifact.iter_synonyms())
+    names = [
+        (hpoID, artifact.names[hpoID]) for hpoID, _ in syns if hpoID in artifact.names
+    ]
+    phrases = set()
+    for hpoID, syn in syns + names:
+        symbols = tuple(
+            token.symbol for token in phrase_tokens(syn) if token.symbol is not None
+        )
+        if len(symbols) < 1:
+            continue
+        phrases.add(((hpoID, synonym_tokens(syn)), symbols))
+    return PhraseAutomaton(sorted(phrases, key=lambda x: (x[0][0], x[1])))
+
+
+def locate_phenotypes(text, hpo_syn_file=HPO_SYN_MAP_FILE):
+    # Character spans of every HPO synonym occurrence in the text, e.g. to
+    # highlight where each term was found.
+    return [
+        (match.key[0], match.start, match.end)
+        for match in load_hpo_phrase_automaton(hpo_syn_file).search(phrase_tokens(text))
+    ]
+
+
+def match_synonym_tokens(mr_map, hpo_syn_file=HPO_SYN_MAP_FILE):
+    syn_index = load_hpo_synonym_index(hpo_syn_file)
+    for record_token, record_token_lines in list(mr_map.items()):
+        for hpoID, synTokens in syn_index.get(record_token, ()):
+            lines = record_token_lines
+            for token in synTokens:
+                lines &= mr_map.get(token, 0)
+                if not lines:
+                    break
+            if not lines:
+                continue
+            yield hpoID, synTokens, bitset_to_lines(lines)
+
+
+def match_synonym_phrases(subsentences, words, hpo_syn_file=HPO_SYN_MAP_FILE):
+    # A phrase hit also needs every synonym token among the subsentence words,
+    # as in bag mode, so both modes agree on what a token match is.
+    automaton = load_hpo_phrase_automaton(hpo_syn_file)
+    key_to_lines = defaultdict(set)
+    subsent_to_keys = {}
+    for i in range(len(subsentences)):
+        keys = subsent_to_keys.get(subsentences[i])
+        if keys is None:
+            keys = set(
+                match.key
+                for match in automaton.search(phrase_tokens(subsentences[i]))
+                if match.key[1] <= words[i]
+            )
+            subsent_to_keys[subsentences[i]] = keys
+        for key in keys:
+            key_to_lines[key].add(i)
+    for (hpoID, synTokens), lines in key_to_lines.items():
+        yield hpoID, synTokens, lines
+
+
+def load_extraction_resources(hpo_syn_file=HPO_SYN_MAP_FILE, mode="bag"):
+    # Warms every per-process cache used by extract_phenotypes, e.g. before
+    # forking worker processes.
+    getNames()
+    load_flag_vocabulary()
+    if mode == "phrase":
+        load_hpo_phrase_automaton(hpo_syn_file)
+    else:
+        load_hpo_synonym_index(hpo_syn_file)
+
+
+def lemma_table_vocabulary(hpo_syn_file=HPO_SYN_MAP_FILE):
+    vocabulary = set()
+    syns = load_all_hpo_synonyms(hpo_syn_file)
+    for hpoID in syns.keys():
+        for syn in syns[hpoID]:
+            vocabulary |= synonym_tokens(syn)
+    for flagset in flag_categories.values():
+        vocabulary |= set(flagset)
+    return vocabulary
+
+
+def write_lemma_table(filename=HPO_LEMMA_TABLE_FILE, hpo_syn_file=HPO_SYN_MAP_FILE):
+    with open(filename, "w") as outfile:
+        for word in sorted(lemma_table_vocabulary(hpo_syn_file)):
+            if len(word) < 1:
+                continue
+            outfile.write("\t".join([word] + sorted(compute_word_lemmas(word))) + "\n")
+    load_lemma_table.cache_clear()
+    word_lemmas.cache_clear()
+
+
+class Phenotype(NamedTuple):
+    hpo_id: str
+    name: str
+    occurrences: int
+    earliness: int
+    # Index of the example sentence in PhenotypeExtraction.sentences
+    sentence: int
+    # "high", or "low" when a flag (negation, family, ...) was found nearby
+    confidence: str
+    flag: Optional[str]
+    flag_category: Optional[str]
+
+
+class PhenotypeExtraction(NamedTuple):
+    phenotypes: List[Phenotype]
+    sentences: List[str]
+
+    def example_sentence(self, phenotype):
+        return self.sentences[phenotype.sentence]
+
+
 def sort_ids_by_occurrences_then_earliness(id_to_lines):
     listForm = []
     for hpoid in id_to_lines.keys():
@@ -345,141 +556,168 @@ def sort_ids_by_occurrences_then_earliness(id_to_lines):
     return returnList
 
 
-def extract_phenotypes(record, names, hpo_syn_file=HPO_SYN_MAP_FILE):
-    safe_ID_to_lines = defaultdict(set)
-    unsafe_ID_to_lines = defaultdict(set)
-    medical_record = load_medical_record_subsentences(record)
+def example_line(lines):
+    # The original scan popped the example from the set of line numbers, which
+    # gives the line in its lowest hash slot. Its insertion order came from the
+    # synonym sets and varied with PYTHONHASHSEED; inserting the lines in
+    # ascending order makes the same pick independent of the matching order.
+    return next(iter(set(sorted(lines))))
+
+
+class AnalyzedRecord(NamedTuple):
+    subsentences: List[str]
+    sentences: List[str]
+    words: List[set]
+    flags: List[dict]
+    # (hpoID, synonym tokens, indices of the subsentences it was found in)
+    matches: List[tuple]
+
+
+def analyze_medical_record(medical_record, hpo_syn_file=HPO_SYN_MAP_FILE, mode="bag"):
     medical_record_subsentences = []
     medical_record_words = []
     medical_record_flags = []
     subsent_to_sentence = []
+    # Tokens, lemmas and flags are computed once per distinct (sub)sentence.
+    sentence_to_flags = {}
+    subsent_to_words = {}
     for subsents in medical_record:
-        whole_sentence = ""
-        for subsent in subsents:
-            whole_sentence += subsent + " "
-        whole_sentence = whole_sentence.strip()
-        whole_sentence = re.sub("[^0-9a-zA-Z]+", " ", whole_sentence)
-        flags = get_flags(
-            whole_sentence.split(" "),
-            negative_flags,
-            family_flags,
-            healthy_flags,
-            disease_flags,
-            treatment_flags,
-            history_flags,
-            uncertain_flags,
-            mild_flags,
-        )
+        key = tuple(subsents)
+        if key not in sentence_to_flags:
+            whole_sentence = ""
+            for subsent in subsents:
+                whole_sentence += subsent + " "
+            whole_sentence = whole_sentence.strip()
+            whole_sentence = re.sub("[^0-9a-zA-Z]+", " ", whole_sentence)
+            flags = get_flags(whole_sentence.split(" "))
+            sentence_to_flags[key] = (whole_sentence, flags)
+        whole_sentence, flags = sentence_to_flags[key]
         for subsent in subsents:
+            words = subsent_to_words.get(subsent)
+            if words is None:
+                words = add_lemmas(alphanum_only(set([subsent])))
+                subsent_to_words[subsent] = words
             medical_record_subsentences.append(subsent)
             subsent_to_sentence.append(whole_sentence)
-            medical_record_words.append(add_lemmas(alphanum_only(set([subsent]))))
+            medical_record_words.append(words)
             medical_record_flags.append(flags)
-    # print(medical_record_subsentences)
-    # print(subsent_to_sentence)
-    # print(medical_record_words)
-    # print(medical_record_flags)
 
-    mr_map = load_mr_map(medical_record_words)
-    # print(mr_map)
-
-    syns = load_all_hpo_synonyms(hpo_syn_file)
-    for hpoID in syns.keys():
-        for syn in syns[hpoID]:
-            syn = re.sub("[^0-9a-zA-Z]+", " ", syn.lower())
-            synTokens = alphanum_only(set([syn]))
-            if len(synTokens) < 1:
-                continue
-            firstToken = list(synTokens)[0]
-            lines = set(mr_map[firstToken])
-            for token in synTokens:
-                lines &= set(mr_map[token])
-                if len(lines) < 1:
-                    break
-            if len(lines) < 1:
-                continue
-            for i in lines:
-                line = " ".join(medical_record_words[i])
+    if mode == "phrase":
+        matches = match_synonym_phrases(
+            medical_record_subsentences, medical_record_words, hpo_syn_file
+        )
+    else:
+        mr_map = load_mr_map(medical_record_words)
+        matches = match_synonym_tokens(mr_map, hpo_syn_file)
+    return AnalyzedRecord(
+        medical_record_subsentences,
+        subsent_to_sentence,
+        medical_record_words,
+        medical_record_flags,
+        list(matches),
+    )
+
+
+def summarize_phenotypes(analyzed_records, names):
+    # Classifies the matches of consecutive analyzed parts of one record, line
+    # numbers running across the parts.
+    safe_ID_to_lines = defaultdict(set)
+    unsafe_ID_to_lines = defaultdict(set)
+    unsafe_ID_line_to_flag = {}
+    medical_record_flags = []
+    subsent_to_sentence = []
+    for analyzed in analyzed_records:
+        offset = len(subsent_to_sentence)
+        for hpoID, synTokens, lines in analyzed.matches:
+            for j in lines:
+                i = offset + j
+                line = " ".join(analyzed.words[j])
                 flagged = False
                 if i < 4:
-                    # print(lines)
-                    # print(i)
                     safe_ID_to_lines[hpoID].add(i)
                 elif "inherited" in line:
                     safe_ID_to_lines[hpoID].add(i)
                 else:
-                    for flag in medical_record_flags[i]:
+                    for flag in analyzed.flags[j]:
                         if flag not in synTokens:
                             flagged = True
                             unsafe_ID_to_lines[hpoID].add(i)
+                            unsafe_ID_line_to_flag.setdefault((hpoID, i), flag)
                             break
                     if flagged:
                         continue
                     safe_ID_to_lines[hpoID].add(i)
-    safe_IDs = sort_ids_by_occurrences_then_earliness(safe_ID_to_lines)
-    unsafe_IDs = sort_ids_by_occurrences_then_earliness(unsafe_ID_to_lines)
-    returnString = [
-        "HPO ID\tPhenotype name\tNo. occurrences\tEarliness (lower = earlier)\tExample sentence"
-    ]
-    returnStringUnSafe = [
-        "HPO ID\tPhenotype name\tNo. occurrences\tEarliness (lower = earlier)\tExample sentence"
-    ]
-    for ID in safe_IDs:
-        returnString.append(
-            "\t".join(
-                [
-                    ID,
-                    names[ID],
-                    str(len(safe_ID_to_lines[ID])),
-                    str(min(safe_ID_to_lines[ID])),
-                    subsent_to_sentence[safe_ID_to_lines[ID].pop()],
-                ]
+        medical_record_flags.extend(analyzed.flags)
+        subsent_to_sentence.extend(analyzed.sentences)
+    phenotypes = []
+    for ID in sort_ids_by_occurrences_then_earliness(safe_ID_to_lines):
+        lines = safe_ID_to_lines[ID]
+        example = example_line(lines)
+        phenotypes.append(
+            Phenotype(
+                ID, names[ID], len(lines), min(lines), example, "high", None, None
             )
         )
-    for ID in unsafe_IDs:
-        returnStringUnSafe.append(
-            "\t".join(
-                [
-                    ID,
-                    names[ID],
-                    str(len(unsafe_ID_to_lines[ID])),
-                    str(min(unsafe_ID_to_lines[ID])),
-                    subsent_to_sentence[unsafe_ID_to_lines[ID].pop()],
-                ]
+    for ID in sort_ids_by_occurrences_then_earliness(unsafe_ID_to_lines):
+        lines = unsafe_ID_to_lines[ID]
+        example = example_line(lines)
+        flag = unsafe_ID_line_to_flag[(ID, example)]
+        phenotypes.append(
+            Phenotype(
+                ID,
+                names[ID],
+                len(lines),
+                min(lines),
+                example,
+                "low",
+                flag,
+                medical_record_flags[example][flag],
             )
         )
-    return "\n".join(returnString), "\n".join(returnStringUnSafe)
-
-
-def get_dataframe_from_clinphen(returnString):
-    i = 0
-    returnList = []
-    for element in returnString.split("\n"):
-        if i == 0:
-            i = 1
-            pass
-        else:
-            elementList = []
-            for i in element.split("\t"):
-                elementList.append(i)
-            returnList.append(elementList)
-    if len(returnList) > 0:
-        returnDf = pd.DataFrame(returnList)
-        returnDf.columns = [
-            "HPO ID",
-            "Phenotype name",
-            "No. occurrences",
-            "Earliness (lower = earlier)",
-            "Example sentence",
-        ]
-    else:
-        returnDf = pd.DataFrame(
-            columns=[
-                "HPO ID",
-                "Phenotype name",
-                "No. occurrences",
-                "Earliness (lower = earlier)",
-                "Example sentence",
-            ]
-        )
-    return returnDf
+    return PhenotypeExtraction(phenotypes, subsent_to_sentence)
+
+
+def extract_phenotypes(record, names, hpo_syn_file=HPO_SYN_MAP_FILE, mode="bag"):
+    if mode not in MATCH_MODES:
+        raise ValueError("Unknown matching mode: " + str(mode))
+    medical_record = load_medical_record_subsentences(record)
+    analyzed = analyze_medical_record(medical_record, hpo_syn_file, mode)
+    return summarize_phenotypes([analyzed], names)
+
+
+class IncrementalExtractor:
+    """Re-extracts phenotypes of a record that is being edited.
+
+    The analysis (tokens, lemmas, flags and synonym matches) of every
+    sentence is cached by content, so extract() only re-analyzes the
+    sentences that changed since the previous calls and re-aggregates the
+    occurrence counts and earliness. Results equal extract_phenotypes.
+    """
+
+    def __init__(
+        self, names, hpo_syn_file=HPO_SYN_MAP_FILE, mode="bag", max_sentences=4096
+    ):
+        if mode not in MATCH_MODES:
+            raise ValueError("Unknown matching mode: " + str(mode))
+        self.names = names
+        self.hpo_syn_file = hpo_syn_file
+        self.mode = mode
+        self.max_sentences = max_sentences
+        self.analyzed_sentences = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def extract(self, record):
+        analyzed_records = []
+        for key in segment_medical_record(record).sentences:
+            analyzed = self.analyzed_sentences.pop(key, None)
+            if analyzed is None:
+                self.misses += 1
+                analyzed = analyze_medical_record([key], self.hpo_syn_file, self.mode)
+            else:
+                self.hits += 1
+            self.analyzed_sentences[key] = analyzed
+            analyzed_records.append(analyzed)
+        while len(self.analyzed_sentences) > self.max_sentences:
+            self.analyzed_sentences.popitem(last=False)
+        return summarize_phenotypes(analyzed_records, self.names)
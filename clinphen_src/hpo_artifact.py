@@ -0,0 +1,202 @@
+from bisect import bisect_left
+from collections.abc import Mapping
+from functools import lru_cache
+import array
+import hashlib
+import mmap
+import os
+import struct
+import sys
+
+HPO_NAMES_FILE = "clinphen_src/data/hpo_term_names.txt"
+HPO_SYN_MAP_FILE = "clinphen_src/data/hpo_synonym_filter.txt"
+
+# Layout: header, then uint32 tables (term id offsets, term name offsets,
+# synonym term indices, synonym offsets) and one UTF-8 string blob. The id
+# table holds the named terms, sorted, followed by the terms that only occur
+# in the synonym file, sorted.
+ARTIFACT_MAGIC = b"CLINHPO\0"
+ARTIFACT_VERSION = 2
+ARTIFACT_HEADER = struct.Struct("=8sIc3x32sIII")
+
+
+def artifact_path(syn_file=HPO_SYN_MAP_FILE):
+    return os.path.splitext(syn_file)[0] + ".bin"
+
+
+def hash_hpo_sources(names_file=HPO_NAMES_FILE, syn_file=HPO_SYN_MAP_FILE):
+    digest = hashlib.sha256()
+    for filename in [names_file, syn_file]:
+        with open(filename, "rb") as infile:
+            digest.update(infile.read())
+        digest.update(b"\0")
+    return digest.digest()
+
+
+def build_hpo_artifact(names_file=HPO_NAMES_FILE, syn_file=HPO_SYN_MAP_FILE):
+    names = {}
+    for line in open(names_file):
+        lineData = line.strip().split("\t")
+        names[lineData[0]] = lineData[1]
+    syn_lines = []
+    for line in open(syn_file):
+        lineData = line.strip().split("\t")
+        syn_lines.append((lineData[0], lineData[1]))
+    # Synonyms of terms missing from the names file are kept, as the plain
+    # text loaders did; those terms simply have no name.
+    extra_ids = sorted(set(hpo for hpo, _ in syn_lines if hpo not in names))
+    ids = sorted(names.keys()) + extra_ids
+    id_index = {hpo: i for i, hpo in enumerate(ids)}
+    synonyms = sorted(set((id_index[hpo], syn) for hpo, syn in syn_lines))
+
+    blob = bytearray()
+
+    def add_strings(strings):
+        offsets = array.array("I", [len(blob)])
+        for string in strings:
+            blob.extend(string.encode("utf-8"))
+            offsets.append(len(blob))
+        return offsets
+
+    id_offsets = add_strings(ids)
+    name_offsets = add_strings(names[hpo] for hpo in ids[: len(names)])
+    syn_offsets = add_strings(syn for _, syn in synonyms)
+    syn_terms = array.array("I", [term for term, _ in synonyms])
+
+    header = ARTIFACT_HEADER.pack(
+        ARTIFACT_MAGIC,
+        ARTIFACT_VERSION,
+        sys.byteorder[0].encode("ascii"),
+        hash_hpo_sources(names_file, syn_file),
+        len(names),
+        len(extra_ids),
+        len(synonyms),
+    )
+    return b"".join(
+        [
+            header,
+            id_offsets.tobytes(),
+            name_offsets.tobytes(),
+            syn_terms.tobytes(),
+            syn_offsets.tobytes(),
+            bytes(blob),
+        ]
+    )
+
+
+def compile_hpo_artifact(
+    names_file=HPO_NAMES_FILE, syn_file=HPO_SYN_MAP_FILE, artifact_file=None
+):
+    if artifact_file is None:
+        artifact_file = artifact_path(syn_file)
+    data = build_hpo_artifact(names_file, syn_file)
+    # Write then rename so concurrent workers never map a partial file.
+    tmp_file = artifact_file + "." + str(os.getpid()) + ".tmp"
+    with open(tmp_file, "wb") as outfile:
+        outfile.write(data)
+    os.replace(tmp_file, artifact_file)
+    return data
+
+
+class StringTable:
+    def __init__(self, blob, offsets):
+        self._blob = blob
+        self._offsets = offsets
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i):
+        return str(self._blob[self._offsets[i] : self._offsets[i + 1]], "utf-8")
+
+
+class HpoNames(Mapping):
+    # Read-only HPO ID -> term name view, looked up by bisection over the
+    # sorted named prefix of the artifact ID table.
+    def __init__(self, ids, names):
+        self._ids = ids
+        self._names = names
+
+    def __getitem__(self, hpo):
+        i = bisect_left(self._ids, hpo, 0, len(self._names))
+        if i < len(self._names) and self._ids[i] == hpo:
+            return self._names[i]
+        raise KeyError(hpo)
+
+    def __iter__(self):
+        for i in range(len(self._names)):
+            yield self._ids[i]
+
+    def __len__(self):
+        return len(self._names)
+
+
+class HpoArtifact:
+    def __init__(self, buffer):
+        self._buffer = buffer
+        view = memoryview(buffer)
+        if len(view) < ARTIFACT_HEADER.size:
+            raise ValueError("Truncated HPO artifact")
+        magic, version, byteorder, source_hash, n_terms, n_extra, n_synonyms = (
+            ARTIFACT_HEADER.unpack_from(view)
+        )
+        if magic != ARTIFACT_MAGIC:
+            raise ValueError("Not an HPO artifact")
+        if version != ARTIFACT_VERSION or byteorder != sys.byteorder[0].encode("ascii"):
+            raise ValueError("Incompatible HPO artifact version")
+        self.source_hash = source_hash
+
+        position = ARTIFACT_HEADER.size
+
+        def take_uint32(count):
+            nonlocal position
+            table = view[position : position + 4 * count].cast("I")
+            position += 4 * count
+            return table
+
+        id_offsets = take_uint32(n_terms + n_extra + 1)
+        name_offsets = take_uint32(n_terms + 1)
+        self.synonym_terms = take_uint32(n_synonyms)
+        syn_offsets = take_uint32(n_synonyms + 1)
+        blob = view[position:]
+
+        self.ids = StringTable(blob, id_offsets)
+        self.names = HpoNames(self.ids, StringTable(blob, name_offsets))
+        self.synonyms = StringTable(blob, syn_offsets)
+
+    def iter_synonyms(self):
+        for i in range(len(self.synonyms)):
+            yield self.ids[self.synonym_terms[i]], self.synonyms[i]
+
+
+def open_hpo_artifact(artifact_file):
+    with open(artifact_file, "rb") as infile:
+        buffer = mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ)
+    return HpoArtifact(buffer)
+
+
+def load_hpo_artifact(names_file=HPO_NAMES_FILE, syn_file=HPO_SYN_MAP_FILE):
+    # Resolve the paths so every spelling of the same files shares one entry.
+    return cached_hpo_artifact(os.path.realpath(names_file), os.path.realpath(syn_file))
+
+
+@lru_cache(maxsize=None)
+def cached_hpo_artifact(names_file, syn_file):
+    # Kept for the process lifetime and recompiled when the source files
+    # change. Mapping the compiled file saves the parsing of the text files at
+    # load time; the synonym index and automaton built from it are still
+    # private to each process.
+    artifact_file = artifact_path(syn_file)
+    source_hash = hash_hpo_sources(names_file, syn_file)
+    try:
+        artifact = open_hpo_artifact(artifact_file)
+        if artifact.source_hash == source_hash:
+            return artifact
+    except (OSError, ValueError):
+        pass
+    try:
+        compile_hpo_artifact(names_file, syn_file, artifact_file)
+        return open_hpo_artifact(artifact_file)
+    except OSError:
+        # Read-only data directory: keep the compiled artifact in memory.
+        return HpoArtifact(build_hpo_artifact(names_file, syn_file))
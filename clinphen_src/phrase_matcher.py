@@ -0,0 +1,90 @@
+from collections import deque
+from typing import Callable, Hashable, Iterable, List, NamedTuple, Optional, Tuple
+import re
+
+# Words are alphanumeric runs; these characters close a phrase (they end
+# points and subpoints in get_phenotypes_lf), so no match spans them.
+TOKEN_PATTERN = re.compile(r"[0-9a-zA-Z]+|[.•;:,\t]")
+
+
+class Token(NamedTuple):
+    symbol: Optional[str]
+    start: int
+    end: int
+
+
+class PhraseMatch(NamedTuple):
+    key: Hashable
+    start: int
+    end: int
+
+
+def tokenize(text: str, normalize: Callable[[str], str] = str.lower) -> List[Token]:
+    # Boundary tokens carry symbol None.
+    tokens = []
+    for match in TOKEN_PATTERN.finditer(text):
+        word = match.group()
+        symbol = normalize(word) if word[0].isalnum() else None
+        tokens.append(Token(symbol or None, match.start(), match.end()))
+    return tokens
+
+
+class PhraseAutomaton:
+    """Token-level Aho-Corasick automaton.
+
+    Phrases are sequences of normalized tokens; search() reports every
+    occurrence of every phrase in a token stream in one linear scan.
+    """
+
+    def __init__(self, phrases: Iterable[Tuple[Hashable, Tuple[str, ...]]]) -> None:
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+        for key, symbols in phrases:
+            if len(symbols) < 1:
+                continue
+            state = 0
+            for symbol in symbols:
+                next_state = self._goto[state].get(symbol)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][symbol] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                state = next_state
+            self._output[state].append((key, len(symbols)))
+        self._build_failure_links()
+
+    def _build_failure_links(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for symbol, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and symbol not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(symbol, 0)
+                self._output[next_state] = (
+                    self._output[next_state] + self._output[self._fail[next_state]]
+                )
+
+    def __len__(self) -> int:
+        return len(self._goto)
+
+    def search(self, tokens: List[Token]) -> List[PhraseMatch]:
+        matches = []
+        state = 0
+        for i, token in enumerate(tokens):
+            if token.symbol is None:
+                state = 0
+                continue
+            while state and token.symbol not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(token.symbol, 0)
+            for key, length in self._output[state]:
+                matches.append(
+                    PhraseMatch(key, tokens[i - length + 1].start, token.end)
+                )
+        return matches
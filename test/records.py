@@ -0,0 +1,6 @@
+# Translated letters used as sample records by the extraction tests.
+RECORDS = [
+    "Dear colleagues, I received in consultation Mr CAS INDEX for recurrent fever and Crohn's disease. He has a history of recurrent epistaxis. Among the family history, his mother had ovarian cancer. He measures 1.90 m ( +2.5 SD ) , weighs 93 kg ( +3.6 SD ) and his head circumference is 57 cm ( +0SD ) . This means Tall stature, Increased body weight.",
+    "Patient: short stature, seizures and intellectual disability.\nFamily history: brother with autism.\nNo microcephaly. Hypotonia noted : mild.\n\nHe has no cleft palate, but scoliosis and hearing loss.\tTall stature inherited from father.",
+    "The child was referred for global developmental delay . On examination , there is hypertelorism , a short neck and clinodactyly . The MRI showed cerebellar atrophy . His sister has epilepsy . There is no hearing loss . Developmental delay and hypotonia were noted at 6 months . Delayed speech is also reported .",
+]
@@ -0,0 +1,212 @@
+import random
+import re
+
+import pytest
+
+pytest.importorskip("presidio_analyzer")
+pytest.importorskip("presidio_anonymizer")
+pytest.importorskip("en_core_web_lg")
+
+from unidecode import unidecode
+
+from utilities.anonymize import (
+    AbbreviationDict,
+    CityRecognizer,
+    add_space_to_comma_endpoint,
+    change_name_patient_abbreviations,
+    city_tokens,
+    get_abbreviation_dict_correction,
+    get_cities_list,
+)
+from utilities.document import as_document
+from utilities.sentence_splitter import RuleSentenceSplitter
+
+
+def deny_list_variants(cities):
+    # The case and accent variants config_deidentify used to give presidio.
+    variants = []
+    for element in cities:
+        variants.append(element)
+        variants.append(element.lower().capitalize())
+        variants.append(element.upper())
+        variants.append(unidecode(element))
+        variants.append(unidecode(element).lower().capitalize())
+        variants.append(unidecode(element).upper())
+    return variants
+
+
+def deny_list_spans(cities, text):
+    # Spans of presidio's PatternRecognizer for the deny list of variants.
+    regex = (
+        r"(?:^|(?<=\W))("
+        + "|".join(re.escape(variant) for variant in deny_list_variants(cities))
+        + r")(?:(?=\W)|$)"
+    )
+    return [
+        (match.start(1), match.end(1))
+        for match in re.finditer(
+            regex, text, flags=re.DOTALL | re.MULTILINE | re.IGNORECASE
+        )
+    ]
+
+
+def city_spans(recognizer, text):
+    return [
+        (result.start, result.end)
+        for result in recognizer.analyze(text, ["FRENCH_CITY"])
+    ]
+
+
+def test_cities_are_found_as_the_deny_list_found_them():
+    # Single word cities, so that no city is the start of another one.
+    cities = [city for city in get_cities_list() if re.fullmatch(r"\w+", city)]
+    sample = random.Random(0).sample(cities, 300)
+    forms = [
+        lambda city: city,
+        str.upper,
+        lambda city: unidecode(city).lower().capitalize(),
+        lambda city: unidecode(city),
+    ]
+    text = " ".join(
+        "Seen in " + forms[i % len(forms)](city) + ", then followed up."
+        for i, city in enumerate(sample)
+    )
+    recognizer = CityRecognizer(sample)
+    assert city_spans(recognizer, text) == deny_list_spans(sample, text)
+    assert len(city_spans(recognizer, text)) == len(sample)
+
+
+def test_compound_city_names_are_matched_whole():
+    recognizer = CityRecognizer(["Abbeville", "Abbeville-Saint-Lucien", "Lyon"])
+    text = "Born in ABBEVILLE-SAINT-LUCIEN, lives near abbeville and Lyons."
+    assert city_spans(recognizer, text) == [(8, 30), (43, 52)]
+
+
+def test_city_tokens_ignore_case_and_accents():
+    assert [token.symbol for token in city_tokens("Saint-Étienne")] == [
+        "saint",
+        "-",
+        "etienne",
+    ]
+    recognizer = CityRecognizer(["Saint-Étienne"])
+    for text in ["SAINT-ETIENNE", "saint-étienne", "Saint-Etienne"]:
+        assert city_spans(recognizer, text) == [(0, len(text))]
+    assert city_spans(recognizer, "Saint-Étiennette") == []
+
+
+def former_change_name_patient_abbreviations(
+    Report, Last_name, First_name, abbreviations_dict
+):
+    # change_name_patient_abbreviations before the index: every key of the
+    # combined dictionary compared with every word.
+    dict_correction_name_abbreviations = {
+        "M.": "M",
+        "Mme.": "Mme",
+        "Mlle.": "Mlle",
+        "Dr.": "Docteur",
+        "Dr": "Docteur",
+        "Pr.": "Professeur",
+        "Pr": "Professeur",
+    }
+    for firstname in First_name.split():
+        dict_correction_name_abbreviations[firstname] = "CAS"
+    for lastname in Last_name.split():
+        dict_correction_name_abbreviations[lastname] = "INDEX"
+    for key, value in abbreviations_dict.items():
+        dict_correction_name_abbreviations[key] = value
+
+    list_replaced = []
+    replaced_Report = []
+    for i in Report.replace("\n", " ").split(" "):
+        append_word = i
+        replace_word = None
+        for key, value in dict_correction_name_abbreviations.items():
+            i_check = i.lower().strip().replace(",", "").replace(".", "")
+            if i_check == key.lower().strip():
+                to_replace = i.strip().replace(",", "").replace(".", "")
+                replace_word = value
+                list_replaced.append(
+                    {
+                        "name": Last_name,
+                        "surname": First_name,
+                        "type": (
+                            "index_case"
+                            if i_check == Last_name or i_check == First_name
+                            else "abbreviations"
+                        ),
+                        "value": to_replace,
+                        "correction": value,
+                        "lf_detected": True,
+                        "manual_validation": True,
+                    }
+                )
+        if replace_word:
+            append_word = append_word.replace(to_replace, replace_word)
+        replaced_Report.append(append_word)
+    return " ".join(replaced_Report), list_replaced
+
+
+REPORT = (
+    "Chers collegues, j'ai vu M. Jean DUPONT, suivi par le Dr. Martin et le Pr "
+    "Durand.\nDupont, jean a une HTA et un RGO. dupont est né le 14/07/1789."
+)
+
+
+@pytest.mark.parametrize(
+    "Last_name, First_name",
+    [("Dupont", "Jean"), ("dupont", "jean"), ("Dupont Martin", "Jean"), ("Pr", "Dr")],
+)
+def test_abbreviations_and_names_are_resolved_as_before(Last_name, First_name):
+    abbreviations = get_abbreviation_dict_correction()
+    assert change_name_patient_abbreviations(
+        REPORT, Last_name, First_name, abbreviations
+    ) == former_change_name_patient_abbreviations(
+        REPORT, Last_name, First_name, abbreviations
+    )
+
+
+def test_overriding_keys_are_resolved_as_before():
+    abbreviations = get_abbreviation_dict_correction()
+    keys = list(abbreviations)
+    generator = random.Random(0)
+    words = keys[:200] + ["Dr", "dr.", "Pr,", "M.", "Jean", "jean", "DUPONT,", "le"]
+    for _ in range(300):
+        overrides = {key: abbreviations[key] for key in generator.sample(keys, 50)}
+        overrides.update({"dr": "doc", "DR": "", "jean": "JJ", "Pr": "Prof"})
+        Last_name = generator.choice(["Dupont", "dupont", "Dupont Martin", "Jean"])
+        First_name = generator.choice(["Jean", "jean", "Marie-Anne", "Pr Jean"])
+        text = " ".join(generator.choice(words) for _ in range(40))
+        for dictionary in [overrides, AbbreviationDict(overrides)]:
+            assert change_name_patient_abbreviations(
+                text, Last_name, First_name, dictionary
+            ) == former_change_name_patient_abbreviations(
+                text, Last_name, First_name, overrides
+            )
+
+
+def former_add_space_to_comma_endpoint(texte, _nlp):
+    # The four passes of add_space_to_comma_endpoint, each segmenting the
+    # text left by the previous one.
+    for punctuation in ",.()":
+        regex = r"(?<!\d)(" + re.escape(punctuation) + r")(?!\d)(?!.*\1)"
+        texte = " ".join(
+            re.sub(
+                regex, " " + punctuation + " ", sentence.text.replace("\n", " ")
+            ).replace("  ", " ")
+            for sentence in _nlp.process(texte).sentences
+        )
+    return texte
+
+
+def test_punctuations_are_spaced_as_before():
+    splitter = RuleSentenceSplitter()
+    generator = random.Random(0)
+    # Spacing the point of "M." makes a sentence of ") X" in the next pass.
+    texts = [REPORT, "M. ) X", "Vu par le Dr. ) Martin, (OFC +2 SD)."]
+    words = ["He", "walks", "(", ")", "OFC", "+2.5", "SD", "M.", "Dr.", ",", "\n"]
+    for _ in range(300):
+        texts.append(" ".join(generator.choice(words) for _ in range(12)))
+    for text in texts:
+        expected = former_add_space_to_comma_endpoint(text, splitter)
+        assert add_space_to_comma_endpoint(text, splitter) == expected
+        assert str(add_space_to_comma_endpoint(as_document(text), splitter)) == expected
@@ -0,0 +1,76 @@
+import gc
+import pickle
+
+from utilities.document import PipelineDocument, as_document, same_kind
+from utilities.sentence_splitter import RuleSentenceSplitter
+
+TEXT = "He has seizures. No cleft palate.\nHe walks."
+
+
+class CountingSplitter(RuleSentenceSplitter):
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+
+    def process(self, text):
+        self.calls += 1
+        return super().process(text)
+
+
+def test_sentences_are_computed_once_per_segmenter():
+    document = PipelineDocument(TEXT)
+    first, second = CountingSplitter(), CountingSplitter()
+    assert document.sentences(first) == [
+        "He has seizures.",
+        "No cleft palate.",
+        "He walks.",
+    ]
+    assert document.sentences(first) is document.sentences(first)
+    document.sentences(second)
+    assert (first.calls, second.calls, document.segmentations) == (1, 1, 2)
+
+
+def test_segmentation_is_not_reused_by_a_new_segmenter():
+    # A segmenter allocated where a collected one lived must not see its
+    # sentences, as it could when they were keyed by id().
+    document = PipelineDocument(TEXT)
+    for _ in range(100):
+        splitter = CountingSplitter()
+        document.sentences(splitter)
+        assert splitter.calls == 1
+        del splitter
+        gc.collect()
+    assert len(document._sentences) == 0
+
+
+def test_modified_text_is_segmented_again():
+    splitter = CountingSplitter()
+    document = PipelineDocument(TEXT)
+    sentences = document.sentences(splitter)
+    # Rewriting the sentences one by one can move their boundaries.
+    modified = document.with_text(" ".join(s.replace(".", " M.") for s in sentences))
+    assert modified.sentences(splitter) == [
+        "He has seizures M. No cleft palate M. He walks M."
+    ]
+    assert (splitter.calls, modified.segmentations) == (2, 2)
+    unchanged = document.with_text(TEXT)
+    assert unchanged is document
+    assert unchanged.sentences(splitter) is sentences
+    assert splitter.calls == 2
+
+
+def test_pickled_document_drops_its_segmentations():
+    splitter = CountingSplitter()
+    document = PipelineDocument(TEXT)
+    document.sentences(splitter)
+    restored = pickle.loads(pickle.dumps(document))
+    assert (restored.text, restored.segmentations) == (TEXT, 1)
+    assert restored.sentences(splitter) == document.sentences(splitter)
+    assert splitter.calls == 2
+
+
+def test_stages_return_the_kind_they_are_given():
+    document = as_document(TEXT)
+    assert as_document(document) is document
+    assert same_kind(TEXT, document) == TEXT
+    assert same_kind(document, document) is document
@@ -0,0 +1,63 @@
+import pandas as pd
+
+from utilities.exception_lexicon import (
+    EXCEPTION_EXTRA_WORDS,
+    EXCEPTION_FILES,
+    ExceptionLexicon,
+    build_exception_lexicon,
+    load_exception_lexicon,
+)
+
+
+def exception_list():
+    # The list get_list_not_deidentify used to build with pandas 1.5, where
+    # astype(str) turned the missing values into "nan".
+    words = []
+    for filename in EXCEPTION_FILES:
+        words += (
+            pd.read_csv(filename, sep="\t", header=None)
+            .fillna("nan")
+            .astype(str)[0]
+            .to_list()
+        )
+    return [x.lower() for x in words + EXCEPTION_EXTRA_WORDS]
+
+
+def test_lexicon_keeps_every_former_exception():
+    lexicon = load_exception_lexicon()
+    former = set(exception_list())
+    assert former <= set(lexicon)
+    # Only the gene NA, which pandas used to read as a missing value ("nan").
+    assert set(lexicon) - former == {"na"}
+    assert "nan" in former
+
+
+def test_lookups_normalize_like_the_analyzer():
+    # anonymize_analyzer tested word.lower().strip() in the former list.
+    lexicon = load_exception_lexicon()
+    former = set(exception_list())
+    words = exception_list()[:500] + EXCEPTION_EXTRA_WORDS
+    words += [" " + word.upper() + "\n" for word in words]
+    words += ["Doe", "John", "Lyon", "", " "]
+    for word in words:
+        assert (word in lexicon) == (word.lower().strip() in former)
+    assert " Behçet\n" in lexicon
+    assert "Doe" not in lexicon
+
+
+def test_compiled_lexicon_is_rebuilt_when_the_sources_change(tmp_path):
+    load_exception_lexicon.cache_clear()
+    source = tmp_path / "exceptions.tsv"
+    lexicon_file = str(tmp_path / "lexicon.bin")
+    source.write_text("Marfan\nNA\n")
+    lexicon = load_exception_lexicon((str(source),), ("Mr",), lexicon_file)
+    assert set(lexicon) == {"marfan", "na", "mr"}
+    assert set(ExceptionLexicon(open(lexicon_file, "rb").read())) == set(lexicon)
+
+    source.write_text("Marfan\nNoonan\n")
+    load_exception_lexicon.cache_clear()
+    lexicon = load_exception_lexicon((str(source),), ("Mr",), lexicon_file)
+    assert set(lexicon) == {"marfan", "noonan", "mr"}
+    built = ExceptionLexicon(build_exception_lexicon([str(source)], ["Mr"]))
+    assert built.source_hash == lexicon.source_hash
+    load_exception_lexicon.cache_clear()
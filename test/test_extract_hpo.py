@@ -0,0 +1,68 @@
+import nltk
+import pytest
+
+from clinphen_src import get_phenotypes_lf
+from records import RECORDS
+from utilities.extract_hpo import (
+    IncrementalHpoExtractor,
+    add_biometrics,
+    extract_hpo_batch,
+    extract_hpo_record,
+)
+from utilities.sentence_splitter import RuleSentenceSplitter
+
+try:
+    nltk.data.find("corpora/wordnet")
+except LookupError:
+    pytest.skip("WordNet is not downloaded", allow_module_level=True)
+
+LETTER = (
+    RECORDS[0]
+    + "\n\nWeight is 20 kg (+2.5 SD), height is 110 cm (-2.1 SD).\n"
+    + RECORDS[1]
+)
+
+
+def extract_letter(text, nlp):
+    # The whole-letter path of a submitted report.
+    from utilities.anonymize import add_space_to_comma_endpoint
+
+    preprocessed, additional_terms = add_biometrics(
+        add_space_to_comma_endpoint(text, nlp), nlp
+    )
+    return extract_hpo_record(preprocessed), additional_terms
+
+
+def phenotypes(extraction):
+    return [
+        (phenotype.hpo_id, phenotype.occurrences, phenotype.earliness)
+        for phenotype in extraction.phenotypes
+    ]
+
+
+@pytest.mark.parametrize("processes", [1, 2])
+def test_batch_extraction_keeps_the_input_order(processes):
+    records = RECORDS * 3 + ["", RECORDS[2].replace("epilepsy", "ataxia")]
+    names = get_phenotypes_lf.getNames()
+    assert list(extract_hpo_batch(iter(records), processes=processes, chunksize=2)) == [
+        get_phenotypes_lf.extract_phenotypes(record, names) for record in records
+    ]
+
+
+def test_curated_letter_matches_the_whole_letter_extraction():
+    pytest.importorskip("presidio_analyzer")
+    pytest.importorskip("presidio_anonymizer")
+    nlp = RuleSentenceSplitter()
+    extractor = IncrementalHpoExtractor(nlp)
+    lines = LETTER.split("\n")
+    for edit in [
+        lines,
+        lines[:2] + ["No seizures, but hypotonia."] + lines[2:],
+        lines[:-1],
+        lines,
+    ]:
+        extraction, additional_terms = extractor.extract(edit)
+        expected, expected_terms = extract_letter("\n".join(edit), nlp)
+        assert phenotypes(extraction) == phenotypes(expected)
+        assert additional_terms == expected_terms
+    assert extractor.extractor.hits > 0
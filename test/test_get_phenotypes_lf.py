@@ -0,0 +1,212 @@
+import os
+import subprocess
+import sys
+
+import nltk
+import pytest
+
+from clinphen_src import get_phenotypes_lf
+from records import RECORDS
+
+try:
+    nltk.data.find("corpora/wordnet")
+except LookupError:
+    pytest.skip("WordNet is not downloaded", allow_module_level=True)
+
+# (HPO ID, No. occurrences, Earliness) of the high then low confidence
+# phenotypes of RECORDS, as extracted by the original synonym scan.
+EXPECTED = [
+    (
+        [
+            ("HP:0001945", 1, 1),
+            ("HP:0001954", 1, 1),
+            ("HP:0100280", 1, 2),
+            ("HP:0000421", 1, 3),
+            ("HP:0004406", 1, 3),
+            ("HP:0000098", 1, 9),
+            ("HP:0004324", 1, 10),
+        ],
+        [("HP:0002664", 1, 5), ("HP:0100615", 1, 5)],
+    ),
+    (
+        [
+            ("HP:0004322", 2, 1),
+            ("HP:0001250", 2, 2),
+            ("HP:0001249", 2, 3),
+            ("HP:0000098", 1, 12),
+            ("HP:0000365", 1, 12),
+        ],
+        [
+            ("HP:0000717", 2, 5),
+            ("HP:0000252", 2, 6),
+            ("HP:0001252", 2, 7),
+            ("HP:0000175", 1, 9),
+            ("HP:0002650", 1, 11),
+        ],
+    ),
+    (
+        [
+            ("HP:0001263", 1, 0),
+            ("HP:0000316", 1, 2),
+            ("HP:0000470", 1, 3),
+            ("HP:0030084", 1, 4),
+            ("HP:0001272", 1, 5),
+            ("HP:0000750", 1, 10),
+        ],
+        [
+            ("HP:0001250", 1, 6),
+            ("HP:0000365", 1, 7),
+            ("HP:0001263", 1, 8),
+            ("HP:0001252", 1, 9),
+        ],
+    ),
+]
+
+
+# A record whose example sentences are not those of the earliest lines, with
+# the (HPO ID, Example sentence) columns the original synonym scan printed for
+# it under every hash seed.
+EXAMPLE_RECORD = (
+    "family: curved middle toe phalanx and Patient: chin with h-shaped crease\n"
+    "comma-shaped carpal bones: increased body fat percentage: dyslexia\n"
+)
+WHOLE = (
+    "family curved middle toe phalanx and patient chin with h shaped crease "
+    "comma shaped carpal bones increased body fat percentage dyslexia"
+)
+FIRST = "family curved middle toe phalanx and patient chin with h shaped crease"
+LAST = "comma shaped carpal bones increased body fat percentage dyslexia"
+EXPECTED_EXAMPLES = (
+    [
+        ("HP:0004235", LAST),
+        ("HP:0041248", LAST),
+        ("HP:0010176", WHOLE),
+        ("HP:0010197", WHOLE),
+        ("HP:0011824", WHOLE),
+        ("HP:0025521", LAST),
+        ("HP:0010522", LAST),
+    ],
+    [
+        ("HP:0025521", WHOLE),
+        ("HP:0010522", WHOLE),
+        ("HP:0010176", FIRST),
+        ("HP:0010197", FIRST),
+        ("HP:0011824", FIRST),
+    ],
+)
+
+
+def summary(extraction, confidence):
+    return [
+        (phenotype.hpo_id, phenotype.occurrences, phenotype.earliness)
+        for phenotype in extraction.phenotypes
+        if phenotype.confidence == confidence
+    ]
+
+
+@pytest.mark.parametrize("record, expected", list(zip(RECORDS, EXPECTED)))
+def test_extract_phenotypes_ids_and_counts(record, expected):
+    names = get_phenotypes_lf.getNames()
+    extraction = get_phenotypes_lf.extract_phenotypes(record, names)
+    assert (summary(extraction, "high"), summary(extraction, "low")) == expected
+
+
+def test_low_confidence_phenotypes_carry_their_flag():
+    names = get_phenotypes_lf.getNames()
+    extraction = get_phenotypes_lf.extract_phenotypes(RECORDS[1], names)
+    flags = {
+        phenotype.hpo_id: (phenotype.flag, phenotype.flag_category)
+        for phenotype in extraction.phenotypes
+        if phenotype.confidence == "low"
+    }
+    assert flags["HP:0000252"] == ("no", "negative")
+    assert flags["HP:0000717"][1] == "family"
+    for phenotype in extraction.phenotypes:
+        assert phenotype.name == names[phenotype.hpo_id]
+
+
+def test_example_sentences_match_the_synonym_scan():
+    names = get_phenotypes_lf.getNames()
+    extraction = get_phenotypes_lf.extract_phenotypes(EXAMPLE_RECORD, names)
+    examples = tuple(
+        [
+            (phenotype.hpo_id, extraction.example_sentence(phenotype))
+            for phenotype in extraction.phenotypes
+            if phenotype.confidence == confidence
+        ]
+        for confidence in ("high", "low")
+    )
+    assert examples == EXPECTED_EXAMPLES
+
+
+def test_example_sentences_do_not_depend_on_the_hash_seed():
+    script = (
+        "from clinphen_src import get_phenotypes_lf\n"
+        "from records import RECORDS\n"
+        "names = get_phenotypes_lf.getNames()\n"
+        "for record in RECORDS:\n"
+        "    print(get_phenotypes_lf.extract_phenotypes(record, names).phenotypes)\n"
+    )
+    outputs = set()
+    for seed in ("1", "2"):
+        env = dict(
+            os.environ,
+            PYTHONHASHSEED=seed,
+            PYTHONPATH=os.path.dirname(os.path.abspath(__file__)),
+        )
+        outputs.add(
+            subprocess.run(
+                [sys.executable, "-c", script],
+                env=env,
+                check=True,
+                capture_output=True,
+                text=True,
+            ).stdout
+        )
+    assert len(outputs) == 1
+
+
+def test_synonym_index_matches_every_synonym_scan():
+    # The inverted index finds the same synonyms as testing each one.
+    for record in RECORDS:
+        subsentences = get_phenotypes_lf.load_medical_record_subsentences(record)
+        analyzed = get_phenotypes_lf.analyze_medical_record(subsentences)
+        found = set(
+            (hpoID, synTokens, tuple(sorted(lines)))
+            for hpoID, synTokens, lines in analyzed.matches
+        )
+        expected = set()
+        syns = get_phenotypes_lf.load_all_hpo_synonyms()
+        for hpoID in syns:
+            for syn in syns[hpoID]:
+                synTokens = get_phenotypes_lf.synonym_tokens(syn)
+                if len(synTokens) < 1:
+                    continue
+                lines = tuple(
+                    i for i, words in enumerate(analyzed.words) if synTokens <= words
+                )
+                if lines:
+                    expected.add((hpoID, synTokens, lines))
+        assert found == expected
+
+
+def test_incremental_extractor_equals_extract_phenotypes():
+    names = get_phenotypes_lf.getNames()
+    extractor = get_phenotypes_lf.IncrementalExtractor(names)
+    for record in RECORDS + [RECORDS[2].replace("epilepsy", "ataxia")]:
+        assert extractor.extract(record) == get_phenotypes_lf.extract_phenotypes(
+            record, names
+        )
+    assert extractor.hits > 0
+
+
+def test_lemma_table_gives_the_same_lemmas(tmp_path):
+    table = str(tmp_path / "lemma_table.tsv")
+    get_phenotypes_lf.write_lemma_table(table)
+    try:
+        lemmas = get_phenotypes_lf.load_lemma_table(table)
+        for word in ["seizures", "abnormalities", "decreased", "brother"]:
+            assert lemmas[word] == get_phenotypes_lf.compute_word_lemmas(word)
+    finally:
+        get_phenotypes_lf.load_lemma_table.cache_clear()
+        get_phenotypes_lf.word_lemmas.cache_clear()
@@ -0,0 +1,87 @@
+import os
+
+from clinphen_src import hpo_artifact
+from clinphen_src.hpo_artifact import (
+    HPO_NAMES_FILE,
+    HPO_SYN_MAP_FILE,
+    HpoArtifact,
+    build_hpo_artifact,
+    load_hpo_artifact,
+)
+
+
+def write_sources(directory, names, synonyms):
+    names_file = str(directory / "names.txt")
+    syn_file = str(directory / "synonyms.txt")
+    with open(names_file, "w") as outfile:
+        for hpo, name in names:
+            outfile.write(hpo + "\t" + name + "\n")
+    with open(syn_file, "w") as outfile:
+        for hpo, syn in synonyms:
+            outfile.write(hpo + "\t" + syn + "\n")
+    return names_file, syn_file
+
+
+def test_artifact_round_trips_the_text_files():
+    names = {}
+    for line in open(HPO_NAMES_FILE):
+        lineData = line.strip().split("\t")
+        names[lineData[0]] = lineData[1]
+    synonyms = set()
+    for line in open(HPO_SYN_MAP_FILE):
+        lineData = line.strip().split("\t")
+        synonyms.add((lineData[0], lineData[1]))
+
+    artifact = HpoArtifact(build_hpo_artifact(HPO_NAMES_FILE, HPO_SYN_MAP_FILE))
+    assert dict(artifact.names) == names
+    assert set(artifact.iter_synonyms()) == synonyms
+
+
+def test_synonyms_of_unnamed_terms_are_kept(tmp_path):
+    names_file, syn_file = write_sources(
+        tmp_path,
+        [("HP:0000002", "Abnormality of body height"), ("HP:0000005", "Mode")],
+        [
+            ("HP:0000002", "height abnormality"),
+            ("HP:0000001", "all"),
+            ("HP:0000009", "bladder"),
+        ],
+    )
+    artifact = HpoArtifact(build_hpo_artifact(names_file, syn_file))
+    assert set(artifact.iter_synonyms()) == {
+        ("HP:0000002", "height abnormality"),
+        ("HP:0000001", "all"),
+        ("HP:0000009", "bladder"),
+    }
+    assert list(artifact.names) == ["HP:0000002", "HP:0000005"]
+    assert "HP:0000001" not in artifact.names
+    assert "HP:0000009" not in artifact.names
+    assert artifact.names["HP:0000005"] == "Mode"
+
+
+def test_stale_artifact_is_recompiled(tmp_path):
+    names_file, syn_file = write_sources(
+        tmp_path, [("HP:0000002", "Height")], [("HP:0000002", "height")]
+    )
+    try:
+        artifact = load_hpo_artifact(names_file, syn_file)
+        assert os.path.exists(hpo_artifact.artifact_path(syn_file))
+        assert list(artifact.iter_synonyms()) == [("HP:0000002", "height")]
+
+        write_sources(tmp_path, [("HP:0000002", "Height")], [("HP:0000002", "stature")])
+        hpo_artifact.cached_hpo_artifact.cache_clear()
+        artifact = load_hpo_artifact(names_file, syn_file)
+        assert list(artifact.iter_synonyms()) == [("HP:0000002", "stature")]
+    finally:
+        hpo_artifact.cached_hpo_artifact.cache_clear()
+
+
+def test_every_spelling_of_the_paths_shares_one_artifact():
+    artifact = load_hpo_artifact()
+    assert load_hpo_artifact(HPO_NAMES_FILE, HPO_SYN_MAP_FILE) is artifact
+    assert load_hpo_artifact(names_file=HPO_NAMES_FILE) is artifact
+    assert load_hpo_artifact(syn_file=HPO_SYN_MAP_FILE) is artifact
+    assert (
+        load_hpo_artifact(os.path.abspath(HPO_NAMES_FILE), "./" + HPO_SYN_MAP_FILE)
+        is artifact
+    )
@@ -0,0 +1,85 @@
+import nltk
+import pytest
+
+from clinphen_src import get_phenotypes_lf
+from clinphen_src.phrase_matcher import PhraseAutomaton, PhraseMatch, tokenize
+from records import RECORDS
+
+
+def test_automaton_reports_overlapping_phrases_with_offsets():
+    automaton = PhraseAutomaton(
+        [
+            ("stature", ("short", "stature")),
+            ("neck", ("short", "neck")),
+            ("short", ("short",)),
+        ]
+    )
+    text = "Short stature and a short neck"
+    assert automaton.search(tokenize(text)) == [
+        PhraseMatch("short", 0, 5),
+        PhraseMatch("stature", 0, 13),
+        PhraseMatch("short", 20, 25),
+        PhraseMatch("neck", 20, 30),
+    ]
+
+
+def test_automaton_follows_failure_links():
+    automaton = PhraseAutomaton([("abc", ("a", "b", "c")), ("bcd", ("b", "c", "d"))])
+    assert [match.key for match in automaton.search(tokenize("a b c d"))] == [
+        "abc",
+        "bcd",
+    ]
+
+
+def test_phrases_do_not_cross_boundary_tokens():
+    automaton = PhraseAutomaton([("stature", ("short", "stature"))])
+    assert automaton.search(tokenize("short. stature")) == []
+    assert automaton.search(tokenize("short; stature")) == []
+    assert automaton.search(tokenize("short, stature")) == []
+    assert len(automaton.search(tokenize("short  stature"))) == 1
+
+
+def has_wordnet():
+    try:
+        nltk.data.find("corpora/wordnet")
+    except LookupError:
+        return False
+    return True
+
+
+needs_wordnet = pytest.mark.skipif(
+    not has_wordnet(), reason="WordNet is not downloaded"
+)
+
+
+def analyze(record, mode):
+    subsentences = get_phenotypes_lf.load_medical_record_subsentences(record)
+    analyzed = get_phenotypes_lf.analyze_medical_record(subsentences, mode=mode)
+    return {
+        (hpoID, synTokens): set(lines) for hpoID, synTokens, lines in analyzed.matches
+    }
+
+
+@needs_wordnet
+@pytest.mark.parametrize("record", RECORDS)
+def test_phrase_matches_are_a_subset_of_bag_matches(record):
+    bag = analyze(record, "bag")
+    phrase = analyze(record, "phrase")
+    assert phrase
+    for key, lines in phrase.items():
+        assert lines <= bag[key]
+
+
+@needs_wordnet
+def test_term_names_in_natural_order_are_found_by_both_modes():
+    names = get_phenotypes_lf.getNames()
+    record = RECORDS[1]
+    for mode in get_phenotypes_lf.MATCH_MODES:
+        found = set(
+            phenotype.hpo_id
+            for phenotype in get_phenotypes_lf.extract_phenotypes(
+                record, names, mode=mode
+            ).phenotypes
+        )
+        # Short stature, Seizure, Intellectual disability, Hearing impairment
+        assert {"HP:0004322", "HP:0001250", "HP:0001249", "HP:0000365"} <= found
@@ -0,0 +1,129 @@
+import pytest
+
+from utilities.sentence_splitter import (
+    RuleSentenceSplitter,
+    Sentence,
+    SplitDocument,
+    splitter_agreement,
+)
+
+# Translated letters, as MarianMT writes them and after the spacing stage,
+# with their sentences annotated by hand.
+TRANSLATED_REPORTS = [
+    (
+        "Dear colleagues, I received in consultation Mr. John Doe born on "
+        "14/07/1789 for a recurrent fever and Crohn's disease. He has a history "
+        "of recurrent epistaxis. Among the family history, his mother had "
+        "ovarian cancer. He measures 1.90 m (+2.5 SD), weighs 93 kg (+3.6 SD) "
+        "and his head circumference is 57 cm (+0SD) ...",
+        [
+            "Dear colleagues, I received in consultation Mr. John Doe born on "
+            "14/07/1789 for a recurrent fever and Crohn's disease.",
+            "He has a history of recurrent epistaxis.",
+            "Among the family history, his mother had ovarian cancer.",
+            "He measures 1.90 m (+2.5 SD), weighs 93 kg (+3.6 SD) and his head "
+            "circumference is 57 cm (+0SD) ...",
+        ],
+    ),
+    (
+        "Dear colleague , I saw Ms. Jane Roe , aged 6 years , for global "
+        "developmental delay . She walked at 24 months . On examination , there "
+        "is hypertelorism , a short neck and clinodactyly of the 5th fingers . "
+        "The karyotype is normal ( 46,XX ) . An array-CGH is in progress .",
+        [
+            "Dear colleague , I saw Ms. Jane Roe , aged 6 years , for global "
+            "developmental delay .",
+            "She walked at 24 months .",
+            "On examination , there is hypertelorism , a short neck and "
+            "clinodactyly of the 5th fingers .",
+            "The karyotype is normal ( 46,XX ) .",
+            "An array-CGH is in progress .",
+        ],
+    ),
+    (
+        "Reason for consultation: epilepsy.\n\nHistory: first seizure at 3 "
+        "years, treated with valproate. IQ evaluated at 65 (WISC-V). No family "
+        "history of epilepsy.\nDiagnosis: intellectual disability with epilepsy\n"
+        "We will see her again in 6 months. Dr. Martin",
+        [
+            "Reason for consultation: epilepsy.",
+            "History: first seizure at 3 years, treated with valproate.",
+            "IQ evaluated at 65 (WISC-V).",
+            "No family history of epilepsy.",
+            "Diagnosis: intellectual disability with epilepsy",
+            "We will see her again in 6 months.",
+            "Dr. Martin",
+        ],
+    ),
+    (
+        "The child is followed by Pr. Dupont at the hospital. Is the hearing "
+        "loss congenital? The parents do not know. Growth is regular: weight "
+        "20 kg (-0.5 SD), height 110 cm (-2.1 SD), i.e. a short stature.",
+        [
+            "The child is followed by Pr. Dupont at the hospital.",
+            "Is the hearing loss congenital?",
+            "The parents do not know.",
+            "Growth is regular: weight 20 kg (-0.5 SD), height 110 cm (-2.1 SD), "
+            "i.e. a short stature.",
+        ],
+    ),
+]
+
+
+class GoldSplitter:
+    # Hand annotated segmentation of TRANSLATED_REPORTS, exposed as a splitter.
+    def __init__(self, reports):
+        self.reports = dict(reports)
+
+    def process(self, text):
+        sentences = []
+        position = 0
+        for sentence in self.reports[text]:
+            start = text.index(sentence, position)
+            position = start + len(sentence)
+            sentences.append(Sentence(sentence, start, position))
+        return SplitDocument(text, sentences)
+
+
+TEXTS = [text for text, _ in TRANSLATED_REPORTS]
+
+
+def report(name, agreement):
+    print(
+        name
+        + ": "
+        + ", ".join(
+            key + " " + format(value, ".3f") for key, value in agreement.items()
+        )
+    )
+
+
+def test_rule_splitter_against_hand_annotation():
+    agreement = splitter_agreement(
+        TEXTS, RuleSentenceSplitter(), GoldSplitter(TRANSLATED_REPORTS)
+    )
+    report("rule vs gold", agreement)
+    # The only miss is the line break without a point in the third letter.
+    assert agreement["precision"] == 1.0
+    assert agreement["recall"] >= 0.95
+
+
+def test_rule_splitter_keeps_decimals_initials_and_abbreviations():
+    sentences = RuleSentenceSplitter().process(TEXTS[0]).sentences
+    assert [sentence.text for sentence in sentences] == TRANSLATED_REPORTS[0][1]
+    assert all(TEXTS[0][s.start_char : s.end_char] == s.text for s in sentences)
+
+
+def test_rule_splitter_agreement_with_stanza():
+    stanza = pytest.importorskip("stanza")
+    try:
+        nlp = stanza.Pipeline(
+            "en", processors="tokenize", download_method=None, verbose=False
+        )
+    except Exception as error:
+        pytest.skip("stanza English tokenizer is not available: " + str(error))
+    gold = GoldSplitter(TRANSLATED_REPORTS)
+    report("stanza vs gold", splitter_agreement(TEXTS, nlp, gold))
+    agreement = splitter_agreement(TEXTS, RuleSentenceSplitter(), nlp)
+    report("rule vs stanza", agreement)
+    assert agreement["f1"] >= 0.9
@@ -0,0 +1,159 @@
+import sqlite3
+
+import pytest
+
+for module in ["stanza", "torch", "transformers", "presidio_analyzer"]:
+    pytest.importorskip(module)
+
+from utilities.translate import TranslationMemory, Translator
+
+
+def stored_rows(path):
+    connection = sqlite3.connect(path)
+    try:
+        return connection.execute(
+            "SELECT model, source, translation FROM translations ORDER BY source"
+        ).fetchall()
+    finally:
+        connection.close()
+
+
+def test_translation_memory_round_trip(tmp_path):
+    memory = TranslationMemory(str(tmp_path / "memory.sqlite"))
+    memory.put_many("m", {"Il a  mal.": "He is in pain."})
+    assert memory.get_many("m", ["Il a mal.", "Bonjour."]) == {
+        "Il a mal.": "He is in pain."
+    }
+    assert memory.get_many("other", ["Il a mal."]) == {}
+    assert (memory.hits, memory.misses) == (1, 2)
+
+
+def test_translation_memory_counts_rows_without_scanning(tmp_path):
+    path = str(tmp_path / "memory.sqlite")
+    memory = TranslationMemory(path, max_entries=3)
+    memory.put_many("m", {"a": "A", "b": "B"})
+    memory.put_many("m", {"b": "B2", "c": "C"})
+    assert len(memory) == 3
+    assert stored_rows(path) == [("m", "a", "A"), ("m", "b", "B2"), ("m", "c", "C")]
+
+    memory.get_many("m", ["a"])
+    memory.put_many("m", {"d": "D", "e": "E"})
+    # b and c are the least recently used.
+    assert len(memory) == 3
+    assert [row[1] for row in stored_rows(path)] == ["a", "d", "e"]
+    assert len(TranslationMemory(path, max_entries=3)) == 3
+
+
+class FakeTokenizer:
+    def __call__(self, sentences, truncation=True):
+        # MarianTokenizer raises on an empty list as well.
+        if len(sentences) < 1:
+            raise IndexError("list index out of range")
+        return {"input_ids": [sentence.split(" ") for sentence in sentences]}
+
+
+class FakeBackend:
+    key = "fake"
+
+    def __init__(self):
+        self.batches = []
+
+    def translate_batch(self, ids_batch):
+        self.batches.append(ids_batch)
+        return [" ".join(ids).upper() for ids in ids_batch]
+
+
+def fake_translator(memory=None):
+    translator = Translator.__new__(Translator)
+    translator.tokenizer = FakeTokenizer()
+    translator.backend = FakeBackend()
+    translator.memory = memory
+    return translator
+
+
+def test_translate_empty_report():
+    translator = fake_translator()
+    assert translator.translate([], segmented=True) == []
+    assert translator.translate(["", "  \n"], segmented=True) == ["", "  \n"]
+    assert translator.backend.batches == []
+
+
+def test_translate_fully_cached_report(tmp_path):
+    memory = TranslationMemory(str(tmp_path / "memory.sqlite"))
+    translator = fake_translator(memory)
+    texts = ["il a mal. ", " elle aussi"]
+    expected = ["IL A MAL. ", " ELLE AUSSI"]
+    assert translator.translate(texts, segmented=True) == expected
+    assert len(translator.backend.batches) == 1
+    assert translator.translate(texts, segmented=True) == expected
+    assert len(translator.backend.batches) == 1
+
+
+@pytest.mark.parametrize("sentences", [0, 3, 4])
+def test_translate_stream_equals_translate(sentences):
+    batch_size = 3
+    texts = [" phrase " + str(i) + " " for i in range(sentences)] + [" "]
+    translator = fake_translator()
+    expected = translator.translate(texts, segmented=True)
+    generated = []
+    generate = translator.generate
+
+    def recording_generate(sentences, *args):
+        generated.append(len(sentences))
+        return generate(sentences, *args)
+
+    translator.generate = recording_generate
+    pieces = list(
+        translator.translate_stream(texts, batch_size=batch_size, segmented=True)
+    )
+    assert "".join(pieces) == "".join(expected)
+    assert len(pieces) == len(texts)
+    assert generated == [
+        len(range(start, min(start + batch_size, sentences)))
+        for start in range(0, sentences, batch_size)
+    ]
+
+
+def sequential_replace(text, dict_correction):
+    # correct_marian before the single scan: one str.replace per key.
+    found = []
+    for key, value in dict_correction.items():
+        if key in text:
+            found.append(key)
+            text = text.replace(key, value)
+    return text, found
+
+
+@pytest.mark.parametrize(
+    "corrections, text",
+    [
+        ({" a ": " A ", " a b ": " AB ", " b c ": " BC "}, " x a b c a y "),
+        # Adjacent keys sharing their separating space.
+        ({" QI ": " IQ  ", " DS ": " SD "}, " QI DS QI QI "),
+        # A replacement creating a later key, and an earlier one.
+        ({" b ": " B ", " a ": " b ", " c ": " a "}, " a c a "),
+        # Values containing their own key, and keys inside other keys.
+        ({"aa": "aaa", "a": "b", "bb": ""}, "aaaa ba"),
+        ({" \n ": " ", " Mr. ": " Mr "}, " Mr. \n Mr. \n \n "),
+        ({}, " nothing to replace "),
+    ],
+)
+def test_correction_dict_equals_sequential_replace(corrections, text):
+    from utilities.translate import CorrectionDict
+
+    assert CorrectionDict(corrections).replace(text) == sequential_replace(
+        text, corrections
+    )
+
+
+def test_correct_marian_equals_sequential_replace():
+    from records import RECORDS
+    from utilities.translate import correct_marian, get_translation_dict_correction
+
+    dict_correction = get_translation_dict_correction()
+    for record in RECORDS + [" PC at 57 cm ( +0 DS ) , QI 65 , ASD and PFO . "]:
+        text = " " + record.replace("\n", " \n ") + " "
+        MarianText, list_replaced = correct_marian(text, dict_correction, "Doe", "John")
+        expected, found = sequential_replace(text, dict_correction)
+        assert MarianText == expected
+        assert [replaced["value"] for replaced in list_replaced] == found
@@ -1,79 +1,142 @@
 import re
 import json
+from functools import cached_property, lru_cache
 from unidecode import unidecode
-import pandas as pd
 from presidio_anonymizer.entities import OperatorConfig
-from presidio_analyzer import AnalyzerEngine, PatternRecognizer
+from presidio_analyzer import AnalyzerEngine, EntityRecognizer, RecognizerResult
 from presidio_analyzer.nlp_engine import NlpEngineProvider, SpacyNlpEngine
 from presidio_anonymizer import AnonymizerEngine
 import streamlit as st
 from .web_utilities import st_cache_data_if, st_cache_resource_if, supported_cache
+from .document import as_document, same_kind
+from .exception_lexicon import load_exception_lexicon
+from clinphen_src.phrase_matcher import PhraseAutomaton, Token
 import en_core_web_lg
 
 
+def render_spans(text, spans):
+    # Replaces the (start, end, replacement) spans, sorted by start, in one
+    # join. A span overlapping an already replaced one is left out.
+    pieces = []
+    position = 0
+    for start, end, replacement in spans:
+        if start >= position:
+            pieces.append(text[position:start])
+            pieces.append(replacement)
+            position = end
+    pieces.append(text[position:])
+    return "".join(pieces)
+
+
+# Entities de-identified in the translated reports, and the words never
+# reported as such.
+DEIDENTIFY_ENTITIES = ["DATE_TIME", "PERSON", "FRENCH_CITY"]
+DEIDENTIFY_ALLOW_LIST = [
+    "evening",
+    "day",
+    "the day",
+    "the age of",
+    "age",
+    "years",
+    "week",
+    "years old",
+    "months",
+    "hours",
+    "night",
+    "noon",
+    "nights",
+    "tomorrow",
+    "today",
+    "yesterday",
+]
+
+# spaCy components Presidio does not read: its artifacts only hold the
+# tokens, their lemmas (tagger, attribute_ruler, lemmatizer) and the
+# entities (ner).
+DEIDENTIFY_EXCLUDED_PIPES = ["parser"]
+
+
 @st_cache_data_if(supported_cache, max_entries=5, ttl=3600)
 def anonymize_analyzer(
-    MarianText_letter, _analyzer, proper_noun, Last_name, First_name
+    MarianText_letter, _analyzer, _proper_noun, Last_name, First_name
 ):
-    MarianText_anonymize_letter = MarianText_letter
-    # st.write(MarianText_anonymize_letter)
-    analyzer_results_keep = []
-    analyzer_results_return = []
-    analyzer_results_saved = []
+    # st.write(MarianText_letter)
     analyzer_results = _analyzer.analyze(
         text=MarianText_letter,
         language="en",
-        entities=["DATE_TIME", "PERSON", "FRENCH_CITY"],
-        allow_list=[
-            "evening",
-            "day",
-            "the day",
-            "the age of",
-            "age",
-            "years",
-            "week",
-            "years old",
-            "months",
-            "hours",
-            "night",
-            "noon",
-            "nights",
-            "tomorrow",
-            "today",
-            "yesterday",
-        ],
+        entities=DEIDENTIFY_ENTITIES,
+        allow_list=DEIDENTIFY_ALLOW_LIST,
+    )
+    return classify_analyzer_results(
+        MarianText_letter, analyzer_results, _proper_noun, Last_name, First_name
+    )
+
+
+def anonymize_analyzer_reports(
+    MarianText_letters,
+    _analyzer,
+    _proper_noun,
+    Last_names,
+    First_names,
+    batch_size=32,
+    n_process=1,
+):
+    # Same results as anonymize_analyzer for each report, but the spaCy
+    # model runs over the reports by batches of batch_size, in n_process
+    # processes, instead of once per report.
+    nlp_results = _analyzer.nlp_engine.process_batch(
+        MarianText_letters, language="en", batch_size=batch_size, n_process=n_process
     )
-    len_to_add = 0
-    analyser_results_to_sort = {}
-    i = 0
-    detect_duplicated = []
+    results = []
+    for MarianText_letter, (_, nlp_artifacts), Last_name, First_name in zip(
+        MarianText_letters, nlp_results, Last_names, First_names
+    ):
+        analyzer_results = _analyzer.analyze(
+            text=MarianText_letter,
+            language="en",
+            entities=DEIDENTIFY_ENTITIES,
+            allow_list=DEIDENTIFY_ALLOW_LIST,
+            nlp_artifacts=nlp_artifacts,
+        )
+        results.append(
+            classify_analyzer_results(
+                MarianText_letter,
+                analyzer_results,
+                _proper_noun,
+                Last_name,
+                First_name,
+            )
+        )
+    return results
+
+
+def classify_analyzer_results(
+    MarianText_letter, analyzer_results, _proper_noun, Last_name, First_name
+):
+    analyzer_results_keep = []
+    analyzer_results_return = []
+    analyzer_results_saved = []
+    # One span per start position, the first reported one, in text order.
+    spans = {}
     for element in analyzer_results:
-        if element.start not in detect_duplicated:
-            analyser_results_to_sort[i] = element.start
-            detect_duplicated.append(element.start)
-        else:
-            pass
-        i = i + 1
-    sorted_tuples = sorted(analyser_results_to_sort.items(), key=lambda x: x[1])
-    sorted_dict = {k: v for k, v in sorted_tuples}
-    print(sorted_dict)
+        spans.setdefault(element.start, element)
     exception_list_presidio = ["age", "year", "month", "day", "hour", "week"]
 
-    for element_raw in sorted_dict:
-        element = analyzer_results[element_raw]
+    markups = []
+    for start in sorted(spans):
+        element = spans[start]
         word = MarianText_letter[element.start : element.end]
         exception_detected = [e for e in exception_list_presidio if e in word.lower()]
         if word.count("/") == 1 or word.count("/") > 2:
             exception_detected.append("/ or ///")
         if len(exception_detected) == 0:
-            if word.lower().strip() in proper_noun:
-                word_to_replace = (
-                    "**:green[" + word + "]** `[" + element.entity_type + "]`"
-                )
-                MarianText_anonymize_letter = (
-                    MarianText_anonymize_letter[: element.start + len_to_add]
-                    + word_to_replace
-                    + MarianText_anonymize_letter[element.end + len_to_add :]
+            if _proper_noun.contains(word):
+                markups.append(
+                    (
+                        element.start,
+                        element.end,
+                        "**:green[" + word + "]** `[" + element.entity_type + "]`",
+                    )
                 )
                 analyzer_results_saved.append(
                     {
@@ -86,15 +149,13 @@ def anonymize_analyzer(
                         "manual_validation": False,
                     }
                 )
-            # analyzer_results_saved.append(str(element) + ", word:" + word)
             else:
-                word_to_replace = (
-                    "**:red[" + word + "]** `[" + element.entity_type + "]`"
-                )
-                MarianText_anonymize_letter = (
-                    MarianText_anonymize_letter[: element.start + len_to_add]
-                    + word_to_replace
-                    + MarianText_anonymize_letter[element.end + len_to_add :]
+                markups.append(
+                    (
+                        element.start,
+                        element.end,
+                        "**:red[" + word + "]** `[" + element.entity_type + "]`",
+                    )
                 )
                 analyzer_results_keep.append(
                     {
@@ -107,9 +168,7 @@ def anonymize_analyzer(
                         "manual_validation": True,
                     }
                 )
-                # analyzer_results_keep.append(str(element) + ", word:" + word)
                 analyzer_results_return.append(element)
-            len_to_add = len_to_add + len(word_to_replace) - len(word)
         else:
             analyzer_results_saved.append(
                 {
@@ -122,13 +181,11 @@ def anonymize_analyzer(
                     "manual_validation": False,
                 }
             )
-            # analyzer_results_saved.append(str(element) + ", word:" + word)
+    MarianText_anonymize_letter = render_spans(MarianText_letter, markups)
     del analyzer_results
-    del len_to_add
     del exception_list_presidio
-    del analyser_results_to_sort
-    del sorted_tuples
-    del sorted_dict
+    del spans
+    del markups
 
     return (
         MarianText_anonymize_letter,
@@ -140,8 +197,9 @@ def anonymize_analyzer(
 
 @st_cache_data_if(supported_cache, max_entries=5, ttl=3600)
 def anonymize_engine(MarianText_letter, _analyzer_results_return, _engine, _nlp):
+    document = as_document(MarianText_letter)
     result = _engine.anonymize(
-        text=MarianText_letter,
+        text=document.text,
         analyzer_results=_analyzer_results_return,
         operators={
             "PERSON": OperatorConfig("replace", {"new_value": ""}),
@@ -149,81 +207,128 @@ def anonymize_engine(MarianText_letter, _analyzer_results_return, _engine, _nlp)
             "FRENCH_CITY": OperatorConfig("replace", {"new_value": ""}),
         },
     )
-    return reformat_to_report(result.text, _nlp)
+    return reformat_to_report(
+        same_kind(MarianText_letter, document.with_text(result.text)), _nlp
+    )
+
+
+def space_last_punctuation(sentence, punctuation):
+    # Surrounds with spaces the last occurrence of punctuation in the
+    # sentence, unless a digit is next to it, then squeezes double spaces.
+    # Same as re.sub("(?<!\d)(P)(?!\d)(?!.*\1)", " P ", ...) in one scan.
+    sentence = sentence.replace("\n", " ")
+    index = sentence.rfind(punctuation)
+    if (
+        index >= 0
+        and not sentence[index - 1 : index].isdecimal()
+        and not sentence[index + 1 : index + 2].isdecimal()
+    ):
+        sentence = sentence[:index] + " " + punctuation + " " + sentence[index + 1 :]
+    return sentence.replace("  ", " ")
+
+
+def add_space_to_punctuations(texte, _nlp, punctuations):
+    # One pass per punctuation over the sentences of the text left by the
+    # previous pass. Spacing a point can move sentence boundaries, so the
+    # text is segmented again after every pass that changed it.
+    document = as_document(texte)
+    for punctuation in punctuations:
+        spaced = [
+            space_last_punctuation(sentence, punctuation)
+            for sentence in document.sentences(_nlp)
+        ]
+        document = document.with_text(" ".join(spaced))
+    return same_kind(texte, document)
 
 
 @st_cache_data_if(supported_cache, max_entries=10, ttl=3600)
 def add_space_to_comma(texte, _nlp):
-    text_list = []
-    regex = "(?<!\d)(\,)(?!\d)(?!.*\1)"
-    for sentence in _nlp.process(texte).sentences:
-        text_space = re.sub(regex, " , ", sentence.text.replace("\n", " "))
-        text_space_no_db = text_space.replace("  ", " ")
-        text_list.append(text_space_no_db)
-        # print(text_space_no_db)
-    return " ".join(text_list)
+    return add_space_to_punctuations(texte, _nlp, ",")
 
 
 @st_cache_data_if(supported_cache, max_entries=10, ttl=3600)
 def add_space_to_endpoint(texte, _nlp):
-    text_list = []
-    regex = "(?<!\d)(\.)(?!\d)(?!.*\1)"
-    for sentence in _nlp.process(texte).sentences:
-        text_space = re.sub(regex, " . ", sentence.text.replace("\n", " "))
-        text_space_no_db = text_space.replace("  ", " ")
-        text_list.append(text_space_no_db)
-        # print(text_space_no_db)
-    return " ".join(text_list)
+    return add_space_to_punctuations(texte, _nlp, ".")
 
 
 @st_cache_data_if(supported_cache, max_entries=10, ttl=3600)
 def add_space_to_leftp(texte, _nlp):
-    text_list = []
-    regex = "(?<!\d)(\()(?!\d)(?!.*\1)"
-    for sentence in _nlp.process(texte).sentences:
-        text_space = re.sub(regex, " ( ", sentence.text.replace("\n", " "))
-        text_space_no_db = text_space.replace("  ", " ")
-        text_list.append(text_space_no_db)
-        # print(text_space_no_db)
-    return " ".join(text_list)
+    return add_space_to_punctuations(texte, _nlp, "(")
 
 
 @st_cache_data_if(supported_cache, max_entries=10, ttl=3600)
 def add_space_to_rightp(texte, _nlp):
-    text_list = []
-    regex = "(?<!\d)(\))(?!\d)(?!.*\1)"
-    for sentence in _nlp.process(texte).sentences:
-        text_space = re.sub(regex, " ) ", sentence.text.replace("\n", " "))
-        text_space_no_db = text_space.replace("  ", " ")
-        text_list.append(text_space_no_db)
-        # print(text_space_no_db)
-    return " ".join(text_list)
+    return add_space_to_punctuations(texte, _nlp, ")")
 
 
 @st_cache_data_if(supported_cache, max_entries=10, ttl=3600)
 def add_space_to_stroph(texte, _nlp):
-    text_list = []
-    regex = "(?<!\d)(')(?!\d)(?!.*\1)"
-    for sentence in _nlp.process(texte).sentences:
-        text_space = re.sub(regex, " ' ", sentence.text.replace("\n", " "))
-        text_space_no_db = text_space.replace("  ", " ")
-        text_list.append(text_space_no_db)
-        # print(text_space_no_db)
-    return " ".join(text_list)
+    return add_space_to_punctuations(texte, _nlp, "'")
 
 
 @st_cache_data_if(supported_cache, max_entries=10, ttl=3600)
 def add_space_to_comma_endpoint(texte, _nlp):
-    text_fr_comma = add_space_to_comma(texte, _nlp)
-    text_fr_comma_endpoint = add_space_to_endpoint(text_fr_comma, _nlp)
-    text_fr_comma_endpoint_leftpc = add_space_to_leftp(text_fr_comma_endpoint, _nlp)
-    text_fr_comma_endpoint_leftpc_right_pc = add_space_to_rightp(
-        text_fr_comma_endpoint_leftpc, _nlp
-    )
-    del text_fr_comma
-    del text_fr_comma_endpoint
-    del text_fr_comma_endpoint_leftpc
-    return text_fr_comma_endpoint_leftpc_right_pc
+    return add_space_to_punctuations(texte, _nlp, ",.()")
+
+
+# Titles expanded in the French reports, before the abbreviations.
+TITLE_ABBREVIATIONS = {
+    "M.": "M",
+    "Mme.": "Mme",
+    "Mlle.": "Mlle",
+    "Dr.": "Docteur",
+    "Dr": "Docteur",
+    "Pr.": "Professeur",
+    "Pr": "Professeur",
+}
+
+
+def normalize_abbreviation(key):
+    return key.lower().strip()
+
+
+class AbbreviationDict(dict):
+    """Abbreviations expanded in the French reports before translation.
+
+    The titles come first, and the abbreviations override them. Words are
+    resolved with one lookup in an index of the normalized keys, built on
+    first use; the dictionary must not change after.
+    """
+
+    @cached_property
+    def index(self):
+        # Normalized key -> (title keys, other abbreviation keys) having it.
+        index = {}
+        sections = [
+            list(TITLE_ABBREVIATIONS),
+            [key for key in self if key not in TITLE_ABBREVIATIONS],
+        ]
+        for section, keys in enumerate(sections):
+            for key in keys:
+                keys_by_section = index.setdefault(
+                    normalize_abbreviation(key), ([], [])
+                )
+                keys_by_section[section].append(key)
+        return index
+
+    def corrections(self, word_check, names, name_keys):
+        # Values of every key matching word_check, in the order of the
+        # combined dictionary: titles, then the patient names (the
+        # name_keys among names), then the abbreviations, later ones
+        # overriding the value of an earlier identical key.
+        title_keys, abbreviation_keys = self.index.get(word_check, ([], []))
+        if name_keys:
+            abbreviation_keys = [key for key in abbreviation_keys if key not in names]
+            name_keys = [key for key in name_keys if key not in TITLE_ABBREVIATIONS]
+        keys = title_keys + name_keys + abbreviation_keys
+        return [
+            (
+                self[key]
+                if key in self
+                else names[key] if key in names else TITLE_ABBREVIATIONS[key]
+            )
+            for key in keys
+        ]
 
 
 @st_cache_resource_if(supported_cache, max_entries=5, ttl=3600)
@@ -231,79 +336,95 @@ def get_abbreviation_dict_correction():
     # dict_correction = {}
     with open("data/fr_abbreviations.json", "r") as outfile:
         hpo_abbreviations = json.load(outfile)
-    return hpo_abbreviations  # dict_correction
+    return AbbreviationDict(hpo_abbreviations)  # dict_correction
 
 
 @st_cache_data_if(supported_cache, max_entries=10, ttl=3600)
 def reformat_to_report(text, _nlp):
+    document = as_document(text)
     cutsentence = []
-    for sentence in _nlp.process(text).sentences:
+    for sentence in document.sentences(_nlp):
         cutsentence.append(
-            sentence.text.replace(" ,", ",")
+            sentence.replace(" ,", ",")
             .replace(" .", ".")
             .replace(" )", ")")
             .replace(" (", "(")
             .replace(" '", "'")
         )
-    return "  \n".join(cutsentence)
+    # Joining the punctuation back can move sentence boundaries ("M . X"),
+    # so the new text is segmented again when a later stage needs it.
+    return same_kind(text, document.with_text("  \n".join(cutsentence)))
 
 
 @st_cache_resource_if(supported_cache, max_entries=5, ttl=3600)
 def get_cities_list():
-    cities = pd.read_csv("data/proper_noun_location_sort.csv")
-    cities.columns = ["ville"]
-    whole_cities_patterns = []
-    list_cities = cities["ville"].to_list()
-    for element in list_cities:
-        whole_cities_patterns.append(element)
-        whole_cities_patterns.append(element.lower().capitalize())
-        whole_cities_patterns.append(element.upper())
-        whole_cities_patterns.append(unidecode(element))
-        whole_cities_patterns.append(unidecode(element).lower().capitalize())
-        whole_cities_patterns.append(unidecode(element).upper())
-    del cities
-    del list_cities
-    return whole_cities_patterns
+    # The first line of the file is read as its header, as pandas did.
+    with open("data/proper_noun_location_sort.csv", "r") as infile:
+        next(infile, None)
+        return [line.strip() for line in infile if line.strip()]
+
+
+# Words and single punctuation marks; spaces between them are ignored.
+CITY_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+
+@lru_cache(maxsize=65536)
+def normalize_city_token(token):
+    return unidecode(token).casefold()
+
+
+def city_tokens(text):
+    return [
+        Token(normalize_city_token(match.group()), match.start(), match.end())
+        for match in CITY_TOKEN_PATTERN.finditer(text)
+    ]
+
+
+class CityRecognizer(EntityRecognizer):
+    """Recognizes city names whatever their case and accents.
+
+    Each city is stored once, as its casefolded and unidecoded tokens, in a
+    token-level Aho-Corasick automaton scanned once over the text; the
+    leftmost, then longest, city names are reported.
+    """
+
+    def __init__(self, cities, supported_entity="FRENCH_CITY"):
+        self.automaton = PhraseAutomaton(
+            (None, tuple(token.symbol for token in city_tokens(city)))
+            for city in cities
+        )
+        super().__init__(supported_entities=[supported_entity], name="CityRecognizer")
+
+    def load(self):
+        pass
+
+    def analyze(self, text, entities, nlp_artifacts=None):
+        results = []
+        end = 0
+        for match in sorted(
+            self.automaton.search(city_tokens(text)),
+            key=lambda match: (match.start, -match.end),
+        ):
+            if match.start >= end:
+                results.append(
+                    RecognizerResult(
+                        entity_type=self.supported_entities[0],
+                        start=match.start,
+                        end=match.end,
+                        score=1.0,
+                        recognition_metadata={
+                            RecognizerResult.RECOGNIZER_NAME_KEY: self.name,
+                            RecognizerResult.RECOGNIZER_IDENTIFIER_KEY: self.id,
+                        },
+                    )
+                )
+                end = match.end
+        return results
 
 
 @st_cache_resource_if(supported_cache, max_entries=5, ttl=3600)
 def get_list_not_deidentify():
-    proper_noun_data = pd.read_csv(
-        "data/exception_list_anonymization.tsv", sep="\t", header=None
-    ).astype(str)
-
-    drug_data = pd.read_csv("data/drug_name.tsv", sep="\t", header=None).astype(str)
-
-    gene_data = pd.read_csv("data/gene_name.tsv", sep="\t", header=None).astype(str)
-
-    proper_noun_list = (
-        proper_noun_data[0].to_list()
-        + drug_data[0].to_list()
-        + gene_data[0].to_list()
-        + [
-            "PN",
-            "TN",
-            "SD",
-            "PCN",
-            "cher",
-            "chere",
-            "CAS",
-            "INDEX",
-            "APGAR",
-            "M",
-            "Ms",
-            "Mr",
-            "Behçet",
-            "hypoacousia",
-        ]
-    )
-    proper_noun = [x.lower() for x in proper_noun_list]
-
-    del proper_noun_data
-    del drug_data
-    del gene_data
-    del proper_noun_list
-    return proper_noun
+    return load_exception_lexicon()
 
 
 @st_cache_resource_if(supported_cache, max_entries=5, ttl=3600)
@@ -312,62 +433,48 @@ def change_name_patient_abbreviations(
 ):
     Report_name = Report
 
-    dict_correction_name_abbreviations = {
-        "M.": "M",
-        "Mme.": "Mme",
-        "Mlle.": "Mlle",
-        "Dr.": "Docteur",
-        "Dr": "Docteur",
-        "Pr.": "Professeur",
-        "Pr": "Professeur",
-    }
-
+    if not isinstance(abbreviations_dict, AbbreviationDict):
+        abbreviations_dict = AbbreviationDict(abbreviations_dict)
+    names = {}
     for firstname in First_name.split():
-        dict_correction_name_abbreviations[firstname] = "CAS"
+        names[firstname] = "CAS"
     for lastname in Last_name.split():
-        dict_correction_name_abbreviations[lastname] = "INDEX"
-    for key, value in abbreviations_dict.items():
-        dict_correction_name_abbreviations[key] = value  # + " [" + key + "]"
+        names[lastname] = "INDEX"
+    names_index = {}
+    for key in names:
+        names_index.setdefault(normalize_abbreviation(key), []).append(key)
 
     list_replaced = []
     splitted_Report = Report_name.replace("\n", " ").split(" ")
     replaced_Report = []
     for i in splitted_Report:
         append_word = i
-        replace_word = None
-        for key, value in dict_correction_name_abbreviations.items():
-            i_check = i.lower().strip().replace(",", "").replace(".", "")
-            if i_check == key.lower().strip():
-                to_replace = i.strip().replace(",", "").replace(".", "")
-                replace_word = value
-                if i_check == Last_name or i_check == First_name:
-                    list_replaced.append(
-                        {
-                            "name": Last_name,
-                            "surname": First_name,
-                            "type": "index_case",
-                            "value": i.strip().replace(",", "").replace(".", ""),
-                            "correction": value,
-                            "lf_detected": True,
-                            "manual_validation": True,
-                        }
-                    )
-                else:
-                    list_replaced.append(
-                        {
-                            "name": Last_name,
-                            "surname": First_name,
-                            "type": "abbreviations",
-                            "value": i.strip().replace(",", "").replace(".", ""),
-                            "correction": value,
-                            "lf_detected": True,
-                            "manual_validation": True,
-                        }
-                    )
-        if replace_word:
-            append_word = append_word.replace(to_replace, replace_word)
+        i_check = i.lower().strip().replace(",", "").replace(".", "")
+        corrections = abbreviations_dict.corrections(
+            i_check, names, names_index.get(i_check, [])
+        )
+        if corrections:
+            to_replace = i.strip().replace(",", "").replace(".", "")
+            if i_check == Last_name or i_check == First_name:
+                replaced_type = "index_case"
+            else:
+                replaced_type = "abbreviations"
+            for value in corrections:
+                list_replaced.append(
+                    {
+                        "name": Last_name,
+                        "surname": First_name,
+                        "type": replaced_type,
+                        "value": to_replace,
+                        "correction": value,
+                        "lf_detected": True,
+                        "manual_validation": True,
+                    }
+                )
+            if corrections[-1]:
+                append_word = append_word.replace(to_replace, corrections[-1])
         replaced_Report.append(append_word)
-    del dict_correction_name_abbreviations
+    del names_index
     del splitted_Report
     return " ".join(replaced_Report), list_replaced
 
@@ -380,14 +487,12 @@ def config_deidentify(cities_list):
             self.nlp = {"en": loaded_spacy_model}
 
     # Load a model a-priori
-    nlp = en_core_web_lg.load()
+    nlp = en_core_web_lg.load(exclude=DEIDENTIFY_EXCLUDED_PIPES)
 
     # Pass the loaded model to the new LoadedSpacyNlpEngine
     loaded_nlp_engine = LoadedSpacyNlpEngine(loaded_spacy_model=nlp)
     # Create a recognizer for cities
-    frcity_recognizer = PatternRecognizer(
-        supported_entity="FRENCH_CITY", deny_list=cities_list
-    )
+    frcity_recognizer = CityRecognizer(cities_list, supported_entity="FRENCH_CITY")
 
     analyzer = AnalyzerEngine(nlp_engine=loaded_nlp_engine, supported_languages=["en"])
     analyzer.registry.add_recognizer(frcity_recognizer)
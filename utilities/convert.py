@@ -1,4 +1,8 @@
+import csv
+import io
 import json
+import os
+import pandas as pd
 import streamlit as st
 from .web_utilities import st_cache_data_if, supported_cache
 from pdf2image import convert_from_bytes, convert_from_path
@@ -45,6 +49,71 @@ def convert_list_phenogenius(df):
     else:
         return "No HPO in letters."
 
+PHENOTYPE_COLUMNS = [
+    "HPO ID",
+    "Phenotype name",
+    "To keep in list",
+    "No. occurrences",
+    "Earliness (lower = earlier)",
+    "Confidence on extraction",
+    "Example sentence",
+]
+
+
+def phenotype_rows(extraction):
+    for phenotype in extraction.phenotypes:
+        yield [
+            phenotype.hpo_id,
+            phenotype.name,
+            phenotype.confidence == "high",
+            phenotype.occurrences,
+            phenotype.earliness,
+            phenotype.confidence,
+            extraction.example_sentence(phenotype),
+        ]
+
+
+def convert_phenotypes_df(extraction):
+    return pd.DataFrame(list(phenotype_rows(extraction)), columns=PHENOTYPE_COLUMNS)
+
+
+def convert_phenotypes(extraction):
+    # Same bytes as convert_df(convert_phenotypes_df(extraction)), written
+    # with the csv dialect pandas uses without building a DataFrame.
+    output = io.StringIO()
+    writer = csv.writer(output, delimiter="\t", lineterminator=os.linesep)
+    writer.writerow(PHENOTYPE_COLUMNS)
+    writer.writerows(phenotype_rows(extraction))
+    return output.getvalue().encode("utf-8")
+
+
+def convert_phenotypes_json(extraction):
+    dict_return = {"features": []}
+    for phenotype in extraction.phenotypes:
+        if phenotype.confidence == "high":
+            dict_return["features"].append(
+                {
+                    "id": phenotype.hpo_id,
+                    "observed": "yes",
+                    "label": phenotype.name,
+                    "type": "phenotype",
+                }
+            )
+    return json.dumps(dict_return)
+
+
+def convert_phenotypes_list_phenogenius(extraction):
+    hpo_list = [
+        phenotype.hpo_id
+        for phenotype in extraction.phenotypes
+        if phenotype.confidence == "high"
+    ]
+    if len(hpo_list) > 0:
+        return ",".join(hpo_list)
+    else:
+        return "No HPO in letters."
+
+
 @st_cache_data_if(supported_cache, max_entries=10, ttl=3600)
 def convert_pdf_to_text(file):
     if isinstance(file, bytes):
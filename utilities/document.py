@@ -0,0 +1,57 @@
+from typing import List
+from weakref import WeakKeyDictionary
+
+
+class PipelineDocument:
+    """Report text passed between the pipeline stages together with its
+    sentence segmentation, computed once per segmenter and kept as long as
+    the text is not modified.
+
+    segmentations counts the segmenter runs over the report, including
+    those made for the documents it derives from. Segmentations are keyed by
+    the segmenter object and dropped with it; they are not pickled.
+    """
+
+    def __init__(self, text: str, segmentations: int = 0) -> None:
+        self._text = text
+        self._sentences: "WeakKeyDictionary[object, List[str]]" = WeakKeyDictionary()
+        self.segmentations = segmentations
+
+    @property
+    def text(self) -> str:
+        return self._text
+
+    def sentences(self, _nlp) -> List[str]:
+        if _nlp not in self._sentences:
+            self._sentences[_nlp] = [
+                sentence.text for sentence in _nlp.process(self._text).sentences
+            ]
+            self.segmentations += 1
+        return self._sentences[_nlp]
+
+    def with_text(self, text: str) -> "PipelineDocument":
+        if text == self._text:
+            return self
+        return PipelineDocument(text, self.segmentations)
+
+    def __str__(self) -> str:
+        return self._text
+
+    def __getstate__(self):
+        return self._text, self.segmentations
+
+    def __setstate__(self, state) -> None:
+        self.__init__(*state)
+
+
+def as_document(text) -> PipelineDocument:
+    if isinstance(text, PipelineDocument):
+        return text
+    return PipelineDocument(text)
+
+
+def same_kind(original, document: PipelineDocument):
+    # Stages return a document when given one, and a string otherwise.
+    if isinstance(original, PipelineDocument):
+        return document
+    return document.text
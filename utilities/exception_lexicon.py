@@ -0,0 +1,134 @@
+from functools import lru_cache
+import hashlib
+import os
+import struct
+
+EXCEPTION_FILES = [
+    "data/exception_list_anonymization.tsv",
+    "data/drug_name.tsv",
+    "data/gene_name.tsv",
+]
+EXCEPTION_EXTRA_WORDS = [
+    "PN",
+    "TN",
+    "SD",
+    "PCN",
+    "cher",
+    "chere",
+    "CAS",
+    "INDEX",
+    "APGAR",
+    "M",
+    "Ms",
+    "Mr",
+    "Behçet",
+    "hypoacousia",
+]
+LEXICON_FILE = "data/exception_lexicon.bin"
+
+# Layout: header, then the lowercased entries as one UTF-8 blob separated
+# by NUL characters.
+LEXICON_MAGIC = b"CLINLEX\0"
+LEXICON_VERSION = 1
+LEXICON_HEADER = struct.Struct("=8sI32sI")
+
+
+def hash_exception_sources(files=EXCEPTION_FILES, extra_words=EXCEPTION_EXTRA_WORDS):
+    digest = hashlib.sha256()
+    for filename in files:
+        with open(filename, "rb") as infile:
+            digest.update(infile.read())
+        digest.update(b"\0")
+    digest.update("\0".join(extra_words).encode("utf-8"))
+    return digest.digest()
+
+
+def build_exception_lexicon(files=EXCEPTION_FILES, extra_words=EXCEPTION_EXTRA_WORDS):
+    # Files are parsed by pandas as before, but every value is kept as
+    # written: gene names such as NA are no longer read as missing values.
+    import pandas as pd
+
+    words = []
+    for filename in files:
+        words += pd.read_csv(
+            filename, sep="\t", header=None, dtype=str, keep_default_na=False
+        )[0].to_list()
+    entries = sorted(set(x.lower() for x in words + extra_words))
+    header = LEXICON_HEADER.pack(
+        LEXICON_MAGIC,
+        LEXICON_VERSION,
+        hash_exception_sources(files, extra_words),
+        len(entries),
+    )
+    return header + "\0".join(entries).encode("utf-8")
+
+
+def compile_exception_lexicon(
+    files=EXCEPTION_FILES, extra_words=EXCEPTION_EXTRA_WORDS, lexicon_file=LEXICON_FILE
+):
+    data = build_exception_lexicon(files, extra_words)
+    # Write then rename so concurrent workers never read a partial file.
+    tmp_file = lexicon_file + "." + str(os.getpid()) + ".tmp"
+    with open(tmp_file, "wb") as outfile:
+        outfile.write(data)
+    os.replace(tmp_file, lexicon_file)
+    return data
+
+
+class ExceptionLexicon:
+    """Words never de-identified: clinical exceptions, drug and gene names.
+
+    Lookups normalize the word as anonymize_analyzer always did, lowercased
+    and stripped, and cost one hash set probe.
+    """
+
+    def __init__(self, data):
+        if len(data) < LEXICON_HEADER.size:
+            raise ValueError("Truncated exception lexicon")
+        magic, version, source_hash, n_entries = LEXICON_HEADER.unpack_from(data)
+        if magic != LEXICON_MAGIC:
+            raise ValueError("Not an exception lexicon")
+        if version != LEXICON_VERSION:
+            raise ValueError("Incompatible exception lexicon version")
+        self.source_hash = source_hash
+        blob = bytes(data[LEXICON_HEADER.size :]).decode("utf-8")
+        self._entries = frozenset(blob.split("\0") if n_entries else [])
+
+    @staticmethod
+    def normalize(word):
+        return word.lower().strip()
+
+    def contains(self, word):
+        return self.normalize(word) in self._entries
+
+    __contains__ = contains
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __iter__(self):
+        return iter(self._entries)
+
+
+@lru_cache(maxsize=None)
+def load_exception_lexicon(
+    files=tuple(EXCEPTION_FILES),
+    extra_words=tuple(EXCEPTION_EXTRA_WORDS),
+    lexicon_file=LEXICON_FILE,
+):
+    # Recompiled when the source files or the extra words change.
+    source_hash = hash_exception_sources(files, extra_words)
+    try:
+        with open(lexicon_file, "rb") as infile:
+            lexicon = ExceptionLexicon(infile.read())
+        if lexicon.source_hash == source_hash:
+            return lexicon
+    except (OSError, ValueError):
+        pass
+    try:
+        return ExceptionLexicon(
+            compile_exception_lexicon(list(files), list(extra_words), lexicon_file)
+        )
+    except OSError:
+        # Read-only data directory: keep the compiled lexicon in memory.
+        return ExceptionLexicon(build_exception_lexicon(list(files), list(extra_words)))
@@ -1,17 +1,19 @@
 import re
+import multiprocessing
+from functools import partial
 from clinphen_src import get_phenotypes_lf
 import streamlit as st
 from .web_utilities import st_cache_data_if, supported_cache
+from .document import as_document, same_kind
 
 
 
 @st_cache_data_if(supported_cache, max_entries=5, ttl=3600)
 def add_biometrics(text, _nlp):
+    document = as_document(text)
     cutsentence_with_biometrics = []
-    cutsentence = []
+    cutsentence = list(document.sentences(_nlp))
     additional_terms = []
-    for sentence in _nlp.process(text).sentences:
-        cutsentence.append(sentence.text)
     keep_element = ["cm", "kg", "qit", "qi"]
     for sentence in cutsentence:
         if any(ext in sentence.lower() for ext in keep_element):
@@ -102,19 +104,66 @@ def add_biometrics(text, _nlp):
     del cutsentence_with_biometrics
     del cutsentence
     del keep_element
-    return " ".join(cutsentence_with_biometrics_return), additional_terms
+    return (
+        same_kind(
+            text, document.with_text(" ".join(cutsentence_with_biometrics_return))
+        ),
+        additional_terms,
+    )
 
 
 
-@st_cache_data_if(supported_cache, max_entries=5, ttl=3600)
-def extract_hpo(inputStr):
+def extract_hpo_record(inputStr, mode="bag"):
     hpo_to_name = get_phenotypes_lf.getNames()
-    returnString, returnStringUnsafe = get_phenotypes_lf.extract_phenotypes(
-        inputStr, hpo_to_name
-    )
-    returnDf = get_phenotypes_lf.get_dataframe_from_clinphen(returnString)
-    returnDfUnsafe = get_phenotypes_lf.get_dataframe_from_clinphen(returnStringUnsafe)
-    del hpo_to_name
-    del returnString
-    del returnStringUnsafe
-    return returnDf, returnDfUnsafe
\ No newline at end of file
+    return get_phenotypes_lf.extract_phenotypes(inputStr, hpo_to_name, mode=mode)
+
+
+@st_cache_data_if(supported_cache, max_entries=5, ttl=3600)
+def extract_hpo(inputStr, mode="bag"):
+    return extract_hpo_record(inputStr, mode)
+
+
+def extract_hpo_batch(records, mode="bag", processes=None, chunksize=16):
+    # Streams PhenotypeExtraction results for an iterable of already translated
+    # records, in input order. HPO names, synonym index and flag vocabulary
+    # are loaded once, before the optional process pool is started.
+    get_phenotypes_lf.load_extraction_resources(mode=mode)
+    if processes is None or processes <= 1:
+        for record in records:
+            yield extract_hpo_record(record, mode)
+        return
+    with multiprocessing.Pool(
+        processes,
+        initializer=get_phenotypes_lf.load_extraction_resources,
+        initargs=(get_phenotypes_lf.HPO_SYN_MAP_FILE, mode),
+    ) as pool:
+        for result in pool.imap(
+            partial(extract_hpo_record, mode=mode), records, chunksize
+        ):
+            yield result
+
+
+class IncrementalHpoExtractor:
+    # Summarization of a letter under curation in the Streamlit app. The
+    # spacing/biometrics preprocessing runs on the whole letter, as for a
+    # submitted report, and only again when the letter changes; the HPO
+    # analysis is cached per sentence, so an edit only reanalyzes what changed.
+    def __init__(self, _nlp, mode="bag"):
+        self.nlp = _nlp
+        self.text = None
+        self.preprocessed = None
+        self.extractor = get_phenotypes_lf.IncrementalExtractor(
+            get_phenotypes_lf.getNames(), mode=mode
+        )
+
+    def extract(self, letter_lines):
+        from .anonymize import add_space_to_comma_endpoint
+
+        text = "\n".join(letter_lines)
+        if text != self.text:
+            self.preprocessed = add_biometrics(
+                add_space_to_comma_endpoint(text, self.nlp), self.nlp
+            )
+            self.text = text
+        preprocessed_text, additional_terms = self.preprocessed
+        return self.extractor.extract(preprocessed_text), list(additional_terms)
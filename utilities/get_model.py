@@ -4,7 +4,7 @@ import os
 import spacy
 import streamlit as st
 from .web_utilities import st_cache_resource_if, supported_cache
-from .translate import Translator
+from .translate import TranslationMemory, Translator
 
 
 @st_cache_resource_if(supported_cache, max_entries=5, ttl=3600)
@@ -41,7 +41,31 @@ def get_models(langue, output=os.path.expanduser("~")):
 
 
 @st_cache_resource_if(supported_cache, max_entries=5, ttl=3600)
-def get_nlp_marian(source_lang):
+def get_translation_memory(path):
+    # The memory stores source sentences before de-identification.
+    return TranslationMemory(path)
+
+
+@st_cache_resource_if(supported_cache, max_entries=5, ttl=3600)
+def get_nlp_marian(
+    source_lang,
+    output=os.path.expanduser("~"),
+    backend="pytorch",
+    quantize=False,
+    num_threads=None,
+    num_interop_threads=None,
+    memory=None,
+):
     nlp_fr = stanza.Pipeline(source_lang, processors="tokenize")
-    marian_fr_en = Translator(source_lang, "en")
+    marian_fr_en = Translator(
+        source_lang,
+        "en",
+        memory=get_translation_memory(memory) if memory else None,
+        backend=backend,
+        model_dir=output,
+        quantize=quantize,
+        num_threads=num_threads,
+        num_interop_threads=num_interop_threads,
+        sentencizer=nlp_fr,
+    )
     return nlp_fr, marian_fr_en
@@ -0,0 +1,186 @@
+from typing import List, NamedTuple
+import argparse
+import os
+import re
+
+# Words followed by a point that does not end the sentence. Single capital
+# letters (initials, "M. Doe") are handled apart.
+ABBREVIATIONS = frozenset(
+    [
+        "approx",
+        "cf",
+        "dr",
+        "e.g",
+        "fig",
+        "i.e",
+        "jr",
+        "max",
+        "min",
+        "mlle",
+        "mme",
+        "mr",
+        "mrs",
+        "ms",
+        "no",
+        "pr",
+        "prof",
+        "resp",
+        "sr",
+        "st",
+        "vs",
+    ]
+)
+
+# English stages whose splitter can be chosen: reformat_to_report (also
+# run by anonymize_engine), add_space_to_comma_endpoint and add_biometrics.
+SENTENCE_SPLITTER_STAGES = ["report", "spacing", "biometrics"]
+
+# Sentence ending punctuation, with closing quotes or brackets, followed by
+# a space; or a blank line.
+BOUNDARY_PATTERN = re.compile(r"[.!?]+[\"'»)\]]*(?=\s)|\n[^\S\n]*\n")
+NEXT_CHAR_PATTERN = re.compile(r"\s*(\S)")
+
+
+class Sentence(NamedTuple):
+    text: str
+    start_char: int
+    end_char: int
+
+
+class SplitDocument(NamedTuple):
+    text: str
+    sentences: List[Sentence]
+
+
+class RuleSentenceSplitter:
+    """Deterministic sentence splitter for the English pipeline stages.
+
+    A point ends a sentence when it is followed by a space and a word that
+    does not start with a lowercase letter, and does not close a known
+    abbreviation or an initial. Decimal values such as "1.90 m" or
+    "+2.5 SD" have no space after their point and are never split. Exposes
+    process() like a stanza pipeline, so it can replace _nlp in a stage.
+    """
+
+    def __init__(self, abbreviations=ABBREVIATIONS) -> None:
+        self.abbreviations = abbreviations
+
+    def is_boundary(self, text: str, match: re.Match) -> bool:
+        if match.group()[0] == "\n":
+            return True
+        next_char = NEXT_CHAR_PATTERN.match(text, match.end())
+        if next_char is None:
+            return True
+        if next_char.group(1).islower():
+            return False
+        if match.group() != ".":
+            return True
+        start = match.start()
+        while start > 0 and not text[start - 1].isspace():
+            start -= 1
+        word = text[start : match.start()].lstrip("(\"'«[")
+        if len(word) == 1 and word.isupper():
+            return False
+        return word.lower() not in self.abbreviations
+
+    def split(self, text: str) -> List[Sentence]:
+        sentences = []
+        start = 0
+        for match in BOUNDARY_PATTERN.finditer(text):
+            if self.is_boundary(text, match):
+                self._append(sentences, text, start, match.end())
+                start = match.end()
+        self._append(sentences, text, start, len(text))
+        return sentences
+
+    @staticmethod
+    def _append(sentences: List[Sentence], text: str, start: int, end: int) -> None:
+        span = text[start:end]
+        stripped = span.strip()
+        if stripped:
+            start += len(span) - len(span.lstrip())
+            sentences.append(Sentence(stripped, start, start + len(stripped)))
+
+    def process(self, text: str) -> SplitDocument:
+        return SplitDocument(text, self.split(text))
+
+
+def sentence_ends(text: str, _nlp) -> List[int]:
+    # End offsets of the sentences, located in the text by their content so
+    # that any splitter exposing process().sentences[].text can be compared.
+    ends = []
+    position = 0
+    for sentence in _nlp.process(text).sentences:
+        start = text.find(sentence.text, position)
+        if start < 0:
+            continue
+        position = start + len(sentence.text)
+        ends.append(position)
+    return ends
+
+
+def splitter_agreement(texts: List[str], _nlp, _reference) -> dict:
+    # Sentence boundary precision, recall and F1 of _nlp against _reference,
+    # and the share of reference sentences found identical.
+    found = expected = common = identical = sentences = 0
+    for text in texts:
+        ends = set(sentence_ends(text, _nlp))
+        reference_ends = set(sentence_ends(text, _reference))
+        found += len(ends)
+        expected += len(reference_ends)
+        common += len(ends & reference_ends)
+        reference_sentences = [s.text for s in _reference.process(text).sentences]
+        split_sentences = set(s.text for s in _nlp.process(text).sentences)
+        sentences += len(reference_sentences)
+        identical += sum(s in split_sentences for s in reference_sentences)
+    precision = common / found if found else 1.0
+    recall = common / expected if expected else 1.0
+    return {
+        "precision": precision,
+        "recall": recall,
+        "f1": (
+            2 * precision * recall / (precision + recall) if precision + recall else 0.0
+        ),
+        "identical_sentences": identical / sentences if sentences else 1.0,
+    }
+
+
+if __name__ == "__main__":
+    # Agreement with stanza on the translated sample letters, which is the
+    # text the English stages split.
+    from .convert import convert_pdf_to_text
+    from .get_model import get_nlp_marian
+    from .translate import get_translation_dict_correction, translate_reports
+    from .anonymize import get_abbreviation_dict_correction
+
+    parser = argparse.ArgumentParser(
+        description="Agreement of the rule-based sentence splitter with stanza"
+    )
+    parser.add_argument("--file", default="data/test.tsv", type=str)
+    parser.add_argument("--language", choices=["fr", "es", "de"], default="fr")
+    parser.add_argument("--model_dir", default=os.path.expanduser("~"), type=str)
+    args = parser.parse_args()
+
+    nlp, marian = get_nlp_marian(args.language, args.model_dir)
+    records = []
+    with open(args.file, "r") as file:
+        for ligne in file:
+            _, Last_name, First_name, text_or_link = ligne.strip().split("\t")
+            if os.path.exists(text_or_link) and text_or_link.lower().endswith(".pdf"):
+                text_or_link = convert_pdf_to_text(text_or_link)
+            records.append((text_or_link, Last_name, First_name))
+    translations = translate_reports(
+        [record[0] for record in records],
+        [record[1] for record in records],
+        [record[2] for record in records],
+        nlp,
+        marian,
+        get_translation_dict_correction(),
+        get_abbreviation_dict_correction(),
+    )
+    agreement = splitter_agreement(
+        [translation[0] for translation in translations], RuleSentenceSplitter(), nlp
+    )
+    print(
+        ", ".join(key + ": " + format(value, ".3f") for key, value in agreement.items())
+    )
@@ -1,11 +1,24 @@
 from dataclasses import dataclass
-from typing import Dict, List, Sequence
+from functools import cached_property
+from typing import Dict, Iterator, List, Optional, Sequence
+import heapq
+import os
+import re
+import sqlite3
+import threading
+import time
 import stanza
+import torch
 import transformers
+try:
+    import ctranslate2
+except ImportError:
+    ctranslate2 = None
 import json
 import streamlit as st
 from .web_utilities import st_cache_data_if, st_cache_resource_if, supported_cache
 from .anonymize import add_space_to_comma_endpoint, change_name_patient_abbreviations
+from .document import as_document
 
 
 @dataclass(frozen=True)
@@ -47,6 +60,18 @@ class SentenceBoundaries:
         )
         return self
 
+    def from_sentence(self, text: str):
+        # Pre-segmented input: the whole text is a single sentence.
+        start = len(text) - len(text.lstrip())
+        end = len(text.rstrip())
+        self.sentence_boundaries.append(
+            SentenceBoundary(text=text[start:end], prefix=text[:start])
+        )
+        self.sentence_boundaries.append(
+            SentenceBoundary(text="", prefix=text[max(start, end) :])
+        )
+        return self
+
     @property
     def nonempty_sentences(self) -> List[str]:
         return [item.text for item in self.sentence_boundaries if item.text]
@@ -63,115 +88,671 @@ class SentenceBoundaries:
         return "".join(map(str, self.sentence_boundaries))
 
 
-@st_cache_resource_if(supported_cache, max_entries=5, ttl=3600)
-def minibatch(seq, size):
-    items = []
-    for x in seq:
-        items.append(x)
-        if len(items) >= size:
-            yield items
-            items = []
-    if items:
-        yield items
+class TranslationMemory:
+    """On-disk cache of sentence translations, keyed by model name and
+    whitespace-normalized source sentence.
+
+    Least recently used entries are evicted beyond max_entries. Source
+    sentences are stored as given, before de-identification.
+    """
+
+    def __init__(self, path: str, max_entries: int = 200000) -> None:
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS translations ("
+                "model TEXT NOT NULL, source TEXT NOT NULL, translation TEXT NOT NULL, "
+                "last_used INTEGER NOT NULL, PRIMARY KEY (model, source))"
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS translations_last_used "
+                "ON translations (last_used)"
+            )
+            (self._count,) = self._connection.execute(
+                "SELECT COUNT(*) FROM translations"
+            ).fetchone()
+
+    @staticmethod
+    def normalize(sentence: str) -> str:
+        return " ".join(sentence.split())
+
+    def get_many(self, model_name: str, sentences: Sequence[str]) -> Dict[str, str]:
+        found = {}
+        with self._lock, self._connection:
+            for sentence in sentences:
+                row = self._connection.execute(
+                    "SELECT translation FROM translations WHERE model = ? AND source = ?",
+                    (model_name, self.normalize(sentence)),
+                ).fetchone()
+                if row is None:
+                    self.misses += 1
+                else:
+                    self.hits += 1
+                    found[sentence] = row[0]
+            self._connection.executemany(
+                "UPDATE translations SET last_used = ? WHERE model = ? AND source = ?",
+                [
+                    (time.time_ns(), model_name, self.normalize(sentence))
+                    for sentence in found
+                ],
+            )
+        return found
+
+    def put_many(self, model_name: str, translations: Dict[str, str]) -> None:
+        rows = [
+            (translated, time.time_ns(), model_name, self.normalize(sentence))
+            for sentence, translated in translations.items()
+        ]
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "UPDATE translations SET translation = ?, last_used = ? "
+                "WHERE model = ? AND source = ?",
+                rows,
+            )
+            # Rows are counted as they are inserted and evicted, instead of
+            # scanning the table on every write.
+            self._count += self._connection.executemany(
+                "INSERT OR IGNORE INTO translations "
+                "(translation, last_used, model, source) VALUES (?, ?, ?, ?)",
+                rows,
+            ).rowcount
+            if self._count > self.max_entries:
+                self._count -= self._connection.execute(
+                    "DELETE FROM translations WHERE rowid IN ("
+                    "SELECT rowid FROM translations ORDER BY last_used LIMIT ?)",
+                    (self._count - self.max_entries,),
+                ).rowcount
+
+    def __len__(self) -> int:
+        return self._count
+
+
+TRANSLATION_BACKENDS = ["pytorch", "ctranslate2"]
+
+
+def set_torch_threads(
+    num_threads: Optional[int] = None, num_interop_threads: Optional[int] = None
+) -> None:
+    if num_threads:
+        torch.set_num_threads(num_threads)
+    if num_interop_threads and torch.get_num_interop_threads() != num_interop_threads:
+        # Only possible before the first parallel work of the process.
+        try:
+            torch.set_num_interop_threads(num_interop_threads)
+        except RuntimeError as error:
+            print("Cannot set the number of interop threads (" + str(error) + ")")
+
+
+def quantized_model_path(model_name, model_dir):
+    return os.path.join(
+        model_dir, "quantized", model_name.replace("/", "--") + "-int8.pt"
+    )
+
+
+def load_quantized_marian_model(model_name, model_dir):
+    # Linear layers are dynamically quantized to int8. The quantized weights
+    # are saved once and loaded into a quantized skeleton of the model.
+    path = quantized_model_path(model_name, model_dir)
+    if os.path.exists(path):
+        config = transformers.MarianConfig.from_pretrained(model_name)
+        model = torch.quantization.quantize_dynamic(
+            transformers.MarianMTModel(config), {torch.nn.Linear}, dtype=torch.qint8
+        )
+        model.load_state_dict(torch.load(path))
+        return model.eval()
+    model = torch.quantization.quantize_dynamic(
+        transformers.MarianMTModel.from_pretrained(model_name),
+        {torch.nn.Linear},
+        dtype=torch.qint8,
+    )
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + "." + str(os.getpid()) + ".tmp"
+    torch.save(model.state_dict(), tmp_path)
+    os.replace(tmp_path, path)
+    return model.eval()
+
+
+class PytorchMarianBackend:
+    def __init__(
+        self,
+        model_name: str,
+        tokenizer,
+        model_dir: str = os.path.expanduser("~"),
+        quantize: bool = False,
+    ) -> None:
+        self.tokenizer = tokenizer
+        if quantize:
+            self.key = model_name + ":pytorch-int8"
+            self.model = load_quantized_marian_model(model_name, model_dir)
+        else:
+            self.key = model_name
+            self.model = transformers.MarianMTModel.from_pretrained(model_name)
+
+    def translate_batch(self, ids_batch: List[List[int]]) -> List[str]:
+        tokens = self.tokenizer.pad({"input_ids": ids_batch}, return_tensors="pt")
+        with torch.inference_mode():
+            translate_tokens = self.model.generate(**tokens)
+        return [
+            self.tokenizer.decode(t, skip_special_tokens=True) for t in translate_tokens
+        ]
+
+
+def ctranslate2_model_dir(model_name, model_dir, quantization="int8"):
+    return os.path.join(
+        model_dir, "ctranslate2", model_name.replace("/", "--") + "-" + quantization
+    )
+
+
+def convert_ctranslate2_model(model_name, model_dir, quantization="int8"):
+    output_dir = ctranslate2_model_dir(model_name, model_dir, quantization)
+    if not os.path.exists(os.path.join(output_dir, "model.bin")):
+        # Convert next to the target then rename, so a concurrent process
+        # never loads a partially written model directory.
+        tmp_dir = output_dir + "." + str(os.getpid()) + ".tmp"
+        ctranslate2.converters.TransformersConverter(model_name).convert(
+            tmp_dir, quantization=quantization, force=True
+        )
+        try:
+            os.replace(tmp_dir, output_dir)
+        except OSError:
+            if not os.path.exists(os.path.join(output_dir, "model.bin")):
+                raise
+    return output_dir
+
+
+class CTranslate2MarianBackend:
+    def __init__(
+        self,
+        model_name: str,
+        tokenizer,
+        model_dir: str,
+        quantization: str = "int8",
+        num_threads: Optional[int] = None,
+    ) -> None:
+        if ctranslate2 is None:
+            raise ImportError("ctranslate2 is not installed")
+        self.key = model_name + ":ctranslate2-" + quantization
+        self.tokenizer = tokenizer
+        self.model = ctranslate2.Translator(
+            convert_ctranslate2_model(model_name, model_dir, quantization),
+            device="cpu",
+            compute_type=quantization,
+            intra_threads=num_threads or 0,
+        )
+
+    def translate_batch(self, ids_batch: List[List[int]]) -> List[str]:
+        # CTranslate2 works on token strings, end of sentence token included.
+        source = [self.tokenizer.convert_ids_to_tokens(ids) for ids in ids_batch]
+        results = self.model.translate_batch(source, max_batch_size=len(source))
+        return [
+            self.tokenizer.decode(
+                self.tokenizer.convert_tokens_to_ids(result.hypotheses[0]),
+                skip_special_tokens=True,
+            )
+            for result in results
+        ]
 
 
 # @dataclass(frozen=True)
 class Translator:
-    def __init__(self, source_lang: str, dest_lang: str, use_gpu: bool = False) -> None:
+    def __init__(
+        self,
+        source_lang: str,
+        dest_lang: str,
+        use_gpu: bool = False,
+        memory: Optional[TranslationMemory] = None,
+        backend: str = "pytorch",
+        model_dir: str = os.path.expanduser("~"),
+        quantize: bool = False,
+        num_threads: Optional[int] = None,
+        num_interop_threads: Optional[int] = None,
+        sentencizer: Optional[stanza.Pipeline] = None,
+    ) -> None:
+        if backend not in TRANSLATION_BACKENDS:
+            raise ValueError(
+                "Unknown translation backend "
+                + backend
+                + ", expected one of "
+                + ", ".join(TRANSLATION_BACKENDS)
+            )
         # self.use_gpu = use_gpu
+        self.memory = memory
         self.model_name = "Helsinki-NLP/opus-mt-" + source_lang + "-" + dest_lang
-        self.model = transformers.MarianMTModel.from_pretrained(self.model_name)
+        self.tokenizer = transformers.MarianTokenizer.from_pretrained(self.model_name)
+        self.backend = None
+        set_torch_threads(num_threads, num_interop_threads)
+        if backend == "ctranslate2":
+            try:
+                self.backend = CTranslate2MarianBackend(
+                    self.model_name, self.tokenizer, model_dir, num_threads=num_threads
+                )
+            except Exception as error:
+                print(
+                    "CTranslate2 backend unavailable ("
+                    + str(error)
+                    + "), falling back to PyTorch"
+                )
+        if self.backend is None:
+            self.backend = PytorchMarianBackend(
+                self.model_name, self.tokenizer, model_dir, quantize
+            )
         # if use_gpu:
         #    self.model = self.model.cuda()
-        self.tokenizer = transformers.MarianTokenizer.from_pretrained(self.model_name)
-        self.sentencizer = stanza.Pipeline(
-            source_lang, processors="tokenize", verbose=False, use_gpu=use_gpu
-        )
 
-    def sentencize(self, texts: Sequence[str]) -> List[SentenceBoundaries]:
+        # A tokenize pipeline of the source language can be shared with the
+        # rest of the application instead of loading a second one.
+        if sentencizer is None:
+            sentencizer = stanza.Pipeline(
+                source_lang, processors="tokenize", verbose=False, use_gpu=use_gpu
+            )
+        self.sentencizer = sentencizer
+
+    def sentencize(
+        self, texts: Sequence[str], segmented: bool = False
+    ) -> List[SentenceBoundaries]:
+        if segmented:
+            return [SentenceBoundaries().from_sentence(text) for text in texts]
         return [
             SentenceBoundaries().from_doc(doc=self.sentencizer.process(text))
             for text in texts
         ]
 
+    def batches(
+        self,
+        sentences: Sequence[str],
+        batch_size: int,
+        max_batch_tokens: int,
+        truncation=True,
+    ):
+        # Sentences are tokenized once and sorted by token length, so each
+        # batch gathers sentences of similar length: at most batch_size of
+        # them and at most max_batch_tokens tokens once padded. The tokenizer
+        # rejects an empty list, so there is nothing to tokenize then.
+        if len(sentences) < 1:
+            return
+        input_ids = self.tokenizer(list(sentences), truncation=truncation)["input_ids"]
+        order = sorted(
+            range(len(sentences)), key=lambda i: len(input_ids[i]), reverse=True
+        )
+        batch = []
+        width = 0
+        for i in order:
+            if batch and (
+                len(batch) >= batch_size or width * (len(batch) + 1) > max_batch_tokens
+            ):
+                yield [sentences[j] for j in batch], [input_ids[j] for j in batch]
+                batch = []
+            if not batch:
+                width = len(input_ids[i])
+            batch.append(i)
+        if batch:
+            yield [sentences[j] for j in batch], [input_ids[j] for j in batch]
+
+    def lookup(self, sentences: Sequence[str]) -> Dict[str, Optional[str]]:
+        # Distinct sentences in order of appearance, mapped to their stored
+        # translation or None when they still have to be translated.
+        translations = {sent: None for sent in sentences}
+        if self.memory is not None:
+            translations.update(self.memory.get_many(self.backend.key, translations))
+        return translations
+
+    def generate(
+        self,
+        sentences: Sequence[str],
+        batch_size: int,
+        max_batch_tokens: int,
+        truncation=True,
+    ) -> Iterator[Dict[str, str]]:
+        for text_batch, ids_batch in self.batches(
+            sentences, batch_size, max_batch_tokens, truncation
+        ):
+            translated = dict(zip(text_batch, self.backend.translate_batch(ids_batch)))
+            if self.memory is not None:
+                self.memory.put_many(self.backend.key, translated)
+            yield translated
+
     def translate(
-        self, texts: Sequence[str], batch_size: int = 10, truncation=True
+        self,
+        texts: Sequence[str],
+        batch_size: int = 64,
+        truncation=True,
+        max_batch_tokens: int = 4096,
+        segmented: bool = False,
     ) -> Sequence[str]:
+        # With segmented=True each text is already a single sentence and is
+        # not split again.
         if isinstance(texts, str):
             raise ValueError("Expected a sequence of texts")
-        text_sentences = self.sentencize(texts)
-        translations = {
-            sent: None for text in text_sentences for sent in text.nonempty_sentences
-        }
-
-        for text_batch in minibatch(
-            sorted(translations, key=len, reverse=True), batch_size
+        text_sentences = self.sentencize(texts, segmented)
+        translations = self.lookup(
+            [sent for text in text_sentences for sent in text.nonempty_sentences]
+        )
+        to_translate = [
+            sent for sent, translated in translations.items() if translated is None
+        ]
+        for translated in self.generate(
+            to_translate, batch_size, max_batch_tokens, truncation
         ):
-            tokens = self.tokenizer(
-                text_batch, return_tensors="pt", padding=True, truncation=truncation
-            )
-            # if self.use_gpu:
-            #    tokens = {k:v.cuda() for k, v in tokens.items()}
-            translate_tokens = self.model.generate(**tokens)
-            translate_batch = [
-                self.tokenizer.decode(t, skip_special_tokens=True)
-                for t in translate_tokens
-            ]
-            for text, translated in zip(text_batch, translate_batch):
-                translations[text] = translated
+            translations.update(translated)
 
         return [
             str(text.map_sentence_boundaries(translations)) for text in text_sentences
         ]
 
+    def translate_stream(
+        self,
+        texts: Sequence[str],
+        batch_size: int = 16,
+        truncation=True,
+        max_batch_tokens: int = 4096,
+        segmented: bool = False,
+    ) -> Iterator[str]:
+        # Yields one string per sentence, in the original order: its prefix
+        # and translation, plus the trailing whitespace of the text after its
+        # last sentence, so the pieces of a text join into translate()'s
+        # result. Sentences are generated in order of appearance, batch_size
+        # at a time, so the first ones are available after the first batch.
+        if isinstance(texts, str):
+            raise ValueError("Expected a sequence of texts")
+        pieces = []
+        for text in self.sentencize(texts, segmented):
+            first = len(pieces)
+            for sb in text.sentence_boundaries:
+                if sb.text or len(pieces) == first:
+                    pieces.append([sb.prefix, sb.text, ""])
+                else:
+                    pieces[-1][2] += sb.prefix
+        translations = self.lookup([text for _, text, _ in pieces if text])
+        to_translate = [
+            sent for sent, translated in translations.items() if translated is None
+        ]
+        position = 0
+        for start in range(0, len(to_translate), batch_size):
+            for translated in self.generate(
+                to_translate[start : start + batch_size],
+                batch_size,
+                max_batch_tokens,
+                truncation,
+            ):
+                translations.update(translated)
+            while position < len(pieces) and (
+                not pieces[position][1] or translations[pieces[position][1]] is not None
+            ):
+                prefix, text, suffix = pieces[position]
+                yield prefix + translations.get(text, text) + suffix
+                position += 1
+        # Pieces after the last generated sentence, or all of them when
+        # nothing had to be generated.
+        for prefix, text, suffix in pieces[position:]:
+            yield prefix + translations.get(text, text) + suffix
 
 
 @st_cache_data_if(supported_cache, max_entries=5, ttl=3600)
 def translate_report(
-    Report, Last_name, First_name, _nlp, _marian_fr_en, dict_correction, abbreviation_dict
+    Report,
+    Last_name,
+    First_name,
+    _nlp,
+    _marian_fr_en,
+    dict_correction,
+    abbreviation_dict,
+    _nlp_en=None,
+):
+    return translate_reports(
+        [Report],
+        [Last_name],
+        [First_name],
+        _nlp,
+        _marian_fr_en,
+        dict_correction,
+        abbreviation_dict,
+        _nlp_en,
+    )[0]
+
+
+def translate_report_stream(
+    Report, Last_name, First_name, _nlp, _marian_fr_en, abbreviation_dict
 ):
-    Report_name, list_replaced_abb_name = change_name_patient_abbreviations(
+    # Raw translated sentences of the report, yielded as they are generated;
+    # correct_translated_report on their "\n".join gives translate_report's
+    # text.
+    Report_name, _ = change_name_patient_abbreviations(
         Report, Last_name, First_name, abbreviation_dict
     )
-    MarianText_raw = translate_marian(Report_name, _nlp, _marian_fr_en)
-    MarianText_space = add_space_to_comma_endpoint(MarianText_raw, _nlp)
+    return translate_marian_stream(Report_name, _nlp, _marian_fr_en)
+
+
+def translate_reports(
+    Reports,
+    Last_names,
+    First_names,
+    _nlp,
+    _marian_fr_en,
+    dict_correction,
+    abbreviation_dict,
+    _nlp_en=None,
+):
+    # Translates many reports at once: their sentences are deduplicated and
+    # batched together by the translator, then scattered back per report.
+    # _nlp_en splits the translated text, _nlp by default.
+    if _nlp_en is None:
+        _nlp_en = _nlp
+    Reports_name = []
+    list_replaced_abb_names = []
+    for Report, Last_name, First_name in zip(Reports, Last_names, First_names):
+        Report_name, list_replaced_abb_name = change_name_patient_abbreviations(
+            Report, Last_name, First_name, abbreviation_dict
+        )
+        Reports_name.append(Report_name)
+        list_replaced_abb_names.append(list_replaced_abb_name)
+    MarianTexts_raw = translate_marian_reports(Reports_name, _nlp, _marian_fr_en)
+    results = []
+    for MarianText_raw, Last_name, First_name, list_replaced_abb_name in zip(
+        MarianTexts_raw, Last_names, First_names, list_replaced_abb_names
+    ):
+        MarianText, list_replaced = correct_translated_report(
+            MarianText_raw, Last_name, First_name, dict_correction, _nlp_en
+        )
+        results.append((MarianText, list_replaced, list_replaced_abb_name))
+    del Reports_name
+    del MarianTexts_raw
+    return results
+
+
+def correct_translated_report(
+    MarianText_raw, Last_name, First_name, dict_correction, _nlp_en
+):
+    MarianText_space = add_space_to_comma_endpoint(MarianText_raw, _nlp_en)
     MarianText, list_replaced = correct_marian(
         MarianText_space, dict_correction, Last_name, First_name
     )
-    del MarianText_raw
     del MarianText_space
-    return MarianText, list_replaced, list_replaced_abb_name
+    return MarianText, list_replaced
 
 
 
 @st_cache_resource_if(supported_cache, max_entries=5, ttl=3600)
 def translate_marian(Report_name, _nlp, _marian_fr_en):
-    list_of_sentence = []
-    for sentence in _nlp.process(Report_name).sentences:
-        list_of_sentence.append(sentence.text)
-    MarianText_raw = "\n".join(_marian_fr_en.translate(list_of_sentence))
-    del list_of_sentence
-    return MarianText_raw
+    return translate_marian_reports([Report_name], _nlp, _marian_fr_en)[0]
+
+
+def translate_marian_stream(Report_name, _nlp, _marian_fr_en):
+    # Same sentences as translate_marian, yielded as soon as they are
+    # translated; "\n".join of the output equals translate_marian's result.
+    return _marian_fr_en.translate_stream(
+        as_document(Report_name).sentences(_nlp),
+        segmented=True,
+    )
+
+
+def translate_marian_reports(Reports_name, _nlp, _marian_fr_en):
+    reports_sentences = []
+    for Report_name in Reports_name:
+        reports_sentences.append(as_document(Report_name).sentences(_nlp))
+    translated = _marian_fr_en.translate(
+        [
+            sentence
+            for list_of_sentence in reports_sentences
+            for sentence in list_of_sentence
+        ],
+        segmented=True,
+    )
+    MarianTexts_raw = []
+    start = 0
+    for list_of_sentence in reports_sentences:
+        MarianTexts_raw.append(
+            "\n".join(translated[start : start + len(list_of_sentence)])
+        )
+        start += len(list_of_sentence)
+    del reports_sentences
+    del translated
+    return MarianTexts_raw
+
+
+# Trie marker of a key ending at a node.
+KEY_END = 0
+
+
+def key_trie(keys) -> dict:
+    trie = {}
+    for key in keys:
+        node = trie
+        for char in key:
+            node = node.setdefault(char, {})
+        node[KEY_END] = key
+    return trie
+
+
+def trie_regex(trie) -> str:
+    # Regular expression matching any key of the trie, shaped as the trie so
+    # that matching at a position costs at most the longest key.
+    def node_regex(node):
+        alternatives = [
+            re.escape(char) + node_regex(child)
+            for char, child in sorted(
+                (item for item in node.items() if isinstance(item[0], str))
+            )
+        ]
+        if KEY_END in node:
+            alternatives.append("")
+        if len(alternatives) == 1:
+            return alternatives[0]
+        return "(?:" + "|".join(alternatives) + ")"
+
+    return node_regex(trie) if trie else "(?!)"
+
+
+class CorrectionDict(dict):
+    """Replacement dictionary with the result of successive str.replace calls.
+
+    Keys are applied in dictionary order, each to the text left by the
+    previous ones, but only the keys found in the text, or created in it by
+    an earlier replacement, are looked at. The key trie is built on first
+    use, the dictionary must not change after.
+    """
+
+    @cached_property
+    def trie(self) -> dict:
+        return key_trie(key for key in self if key)
+
+    @cached_property
+    def pattern(self) -> re.Pattern:
+        # Zero-width, so that keys starting inside another key are found.
+        return re.compile("(?=" + trie_regex(self.trie) + ")")
+
+    @cached_property
+    def rank(self) -> Dict[str, int]:
+        return {key: i for i, key in enumerate(self)}
+
+    @cached_property
+    def max_key_length(self) -> int:
+        return max(map(len, self), default=0)
+
+    def keys_in(self, text: str, start: int = 0, end: Optional[int] = None):
+        # Every key occurring in text at a position in [start, end).
+        if end is None:
+            end = len(text)
+        # The lookahead sees at most the longest key past the last position.
+        for match in self.pattern.finditer(
+            text, max(start, 0), end + self.max_key_length - 1
+        ):
+            if match.start() >= end:
+                break
+            node = self.trie
+            for i in range(match.start(), len(text)):
+                node = node.get(text[i])
+                if node is None:
+                    break
+                if KEY_END in node:
+                    yield node[KEY_END]
+
+    def replace(self, text: str):
+        # Returns the corrected text and the keys replaced, in dictionary order.
+        found = []
+        pending = [self.rank[key] for key in set(self.keys_in(text))]
+        heapq.heapify(pending)
+        queued = set(pending)
+        keys = list(self)
+        while pending:
+            rank = heapq.heappop(pending)
+            key = keys[rank]
+            if key not in text:
+                continue
+            found.append(key)
+            value = self[key]
+            pieces = []
+            inserted = []
+            length = 0
+            position = text.find(key)
+            last = 0
+            while position >= 0:
+                pieces.append(text[last:position])
+                length += position - last
+                inserted.append(length)
+                pieces.append(value)
+                length += len(value)
+                last = position + len(key)
+                position = text.find(key, last)
+            pieces.append(text[last:])
+            text = "".join(pieces)
+            # A replacement can only create keys overlapping the inserted value
+            # or joining its neighbours; those ranked after it are queued.
+            for start in inserted:
+                for new_key in self.keys_in(
+                    text,
+                    start - self.max_key_length + 1,
+                    max(start + len(value), start + 1),
+                ):
+                    new_rank = self.rank[new_key]
+                    if new_rank > rank and new_rank not in queued:
+                        queued.add(new_rank)
+                        heapq.heappush(pending, new_rank)
+        return text, found
 
 
 @st_cache_data_if(supported_cache, max_entries=5, ttl=3600)
 def correct_marian(MarianText_space, dict_correction, Last_name, First_name):
-    MarianText = MarianText_space
+    if not isinstance(dict_correction, CorrectionDict):
+        dict_correction = CorrectionDict(dict_correction)
+    MarianText, found = dict_correction.replace(MarianText_space)
     list_replaced = []
-    for key, value in dict_correction.items():
-        if key in MarianText:
-            list_replaced.append(
-                {
-                    "name": Last_name,
-                    "surname": First_name,
-                    "type": "marian_correction",
-                    "value": key,
-                    "correction": value,
-                    "lf_detected": True,
-                    "manual_validation": True,
-                }
-            )
-            MarianText = MarianText.replace(key, value)
+    for key in found:
+        list_replaced.append(
+            {
+                "name": Last_name,
+                "surname": First_name,
+                "type": "marian_correction",
+                "value": key,
+                "correction": dict_correction[key],
+                "lf_detected": True,
+                "manual_validation": True,
+            }
+        )
     return MarianText, list_replaced
 
 
@@ -197,7 +778,7 @@ def get_translation_dict_correction():
         "Mrs.": "Mrs",
     }
 
-    dict_correction = {}
+    dict_correction = CorrectionDict()
     for key, value in dict_correction_FRspec.items():
         dict_correction[" " + key + " "] = " " + value + " "
 